@@ -11,51 +11,123 @@ from functools import partial
 from pathlib import Path
 
 # Import file detection
-from blkcache.file import detect
+from blkcache.file import File, detect
+from blkcache.file.cached import CachedFile
 from blkcache.file.device import DEFAULT_SECTOR_SIZE
 
 log = logging.getLogger(__name__)
 
+# nbdkit hands pread a buffer to fill, rather than taking a new bytes object back
+API_VERSION = 2
+
 # Global state
 DEV: Path | None = None
 CACHE: Path | None = None
+MAPFILE: Path | None = None  # ddrescue mapfile recording what the cache holds
 SECTOR_SIZE = DEFAULT_SECTOR_SIZE
+DIRECT = False  # Bypass the page cache for the device and cache file
+CACHE_POLLUTE = False  # Let cache file pages stay in the kernel page cache too
 METADATA = {}
 
-# Simple dispatch table: handle -> (file_instance, context_generator)
+# Simple dispatch table: handle -> open file instance
 TABLE = {}
-
-
-def lookup(attr: str, handle: int, table=TABLE):
-    """Generic attribute lookup for dispatch."""
-    obj, _ = table[handle]
-    return getattr(obj, attr)
-
-
-def open_file_context(path: Path, mode: str):
-    """Generator to manage file lifecycle."""
-    file_cls = detect(path)
-    file_instance = file_cls(path, mode)
-    with file_instance as f:
-        yield f
+# Handles released by close(), reused before minting new ones
+FREE: list[int] = []
+# handle -> capability answers, probed once at open
+CAPS: dict[int, dict[str, bool]] = {}
+# With a cache, every handle shares one CachedFile, so there's one filemap to fill and save
+SHARED: CachedFile | None = None
+SHARED_USERS = 0
+
+CAPABILITIES = (
+    "can_write",
+    "can_flush",
+    "can_trim",
+    "can_zero",
+    "can_fast_zero",
+    "can_extents",
+    "is_rotational",
+    "can_multi_conn",
+)
+
+
+def probe(obj) -> dict[str, bool]:
+    """Answer every capability query for obj up front; missing ones are False."""
+    caps = {}
+    for name in CAPABILITIES:
+        attr = getattr(obj, name, False)
+        caps[name] = bool(attr() if callable(attr) else attr)
+    return caps
+
+
+def lookup(attr: str, handle: int, table=CAPS):
+    """Generic capability lookup for dispatch."""
+    return table[handle][attr]
+
+
+def open_file(path: Path, mode: str):
+    """
+    Open the most specific File for path, behind the cache if there is one. Caller must call release() when done.
+
+    Cached opens all share one CachedFile: separate ones would each load the
+    mapfile, and whichever closed last would overwrite the others' fills.
+    """
+    global SHARED, SHARED_USERS
+
+    if CACHE is None:
+        return detect(path)(path, mode, direct=DIRECT).__enter__()
+
+    if SHARED is None:
+        # The cache is held open for the life of the handles, not per read
+        f = CachedFile(
+            detect(path)(path, mode, direct=DIRECT),
+            File(CACHE, "r+b", direct=DIRECT),
+            cache_pollute=CACHE_POLLUTE,
+            mapfile=MAPFILE,
+        )
+        SHARED = f.__enter__()
+    elif "+" in mode and "+" not in SHARED.mode:
+        raise IOError(f"{path} is already open read-only through the cache")
+    SHARED_USERS += 1
+    return SHARED
+
+
+def release(f) -> None:
+    """Close a file from open_file, or just let go of the shared one if other handles still use it."""
+    global SHARED, SHARED_USERS
+
+    if f is SHARED:
+        SHARED_USERS -= 1
+        if SHARED_USERS:
+            return
+        SHARED = None
+    f.__exit__(None, None, None)
 
 
 def config(key: str, val: str) -> None:
     """Stores device, cache paths and parses metadata key-value pairs."""
-    global DEV, CACHE, SECTOR_SIZE, METADATA
+    global DEV, CACHE, MAPFILE, SECTOR_SIZE, DIRECT, CACHE_POLLUTE, METADATA
 
     if key == "device":
         DEV = Path(val)
     elif key == "cache":
         CACHE = Path(val)
+    elif key == "mapfile":
+        MAPFILE = Path(val)
     elif key == "sector" or key == "block":  # Accept both for compatibility
         SECTOR_SIZE = int(val)
+    elif key == "direct":
+        DIRECT = val.lower() in ("1", "true", "yes", "on")
+    elif key == "cache_pollute":
+        CACHE_POLLUTE = val.lower() in ("1", "true", "yes", "on")
     elif key == "metadata":
         # Parse metadata string in format "key1=value1,key2=value2"
         for pair in val.split(","):
-            if "=" in pair:
-                k, v = pair.split("=", 1)
+            k, sep, v = pair.partition("=")
+            if sep:
                 METADATA[k.strip()] = v.strip()
+            elif pair.strip():
+                log.warning("Ignoring metadata without a value: %r", pair)
     else:
         # Store unknown keys in metadata
         METADATA[key] = val
@@ -68,43 +140,43 @@ def config_complete() -> None:
     if DEV is None:
         raise RuntimeError("device= is required")
 
-    # For now, just log the config - we'll build file composition later
-    log.debug("Config: device=%s, cache=%s, sector_size=%d", DEV, CACHE, SECTOR_SIZE)
+    log.debug("Config: device=%s, cache=%s, mapfile=%s, sector_size=%d", DEV, CACHE, MAPFILE, SECTOR_SIZE)
 
 
 def open(_readonly: bool) -> int:
     """Opens device and returns handle ID."""
     mode = "rb" if _readonly else "r+b"
-    handle = len(TABLE) + 1
-    ctx = open_file_context(DEV, mode)
-    obj = next(ctx)
-    TABLE[handle] = (obj, ctx)
+    obj = open_file(DEV, mode)
+    # Only mint an ID once the open has worked, so a failed one can't lose it
+    handle = FREE.pop() if FREE else len(TABLE) + 1
+    TABLE[handle] = obj
+    CAPS[handle] = probe(obj)
     log.debug("Opened file %s as handle %d", DEV, handle)
     return handle
 
 
 def get_size(h: int) -> int:
     """Get file size."""
-    obj, _ = TABLE[h]
-    return obj.size()
+    return TABLE[h].size()
 
 
-def pread(h: int, count: int, offset: int) -> bytes:
-    """Read data at offset."""
-    obj, _ = TABLE[h]
-    return obj.pread(count, offset)
+def pread(h: int, buf, offset: int, flags: int) -> None:
+    """Fill nbdkit's buffer with the data at offset."""
+    got = TABLE[h].preadinto(buf, offset)
+    if got < len(buf):
+        raise IOError(f"Short read at {offset}: {got} of {len(buf)} bytes")
 
 
 def close(h: int) -> None:
     """Close file handle."""
     log.debug("Backend close() called for handle %d", h)
-    if h in TABLE:
-        obj, ctx = TABLE[h]
+    obj = TABLE.pop(h, None)
+    CAPS.pop(h, None)
+    if obj is not None:
         try:
-            next(ctx)  # Advance generator to trigger cleanup
-        except StopIteration:
-            pass
-        del TABLE[h]
+            release(obj)
+        finally:
+            FREE.append(h)  # The ID is free even if closing failed, or len(TABLE) + 1 would collide
     log.debug("Backend close() completed")
 
 
@@ -6,108 +6,211 @@ config, and FileMap data.
 """
 
 import logging
-from typing import Dict, List
+import operator
+import re
+from itertools import repeat
 
 from .file.filemap import FileMap, STATUSES
 
 # Version of the rescue log format
 FORMAT_VERSION = "1.0"
 
+# One data line of the mapfile: pos, size, status byte. Bytes formatting from the
+# raw status code beats str formatting, even after decoding the result
+RANGE_LINE = b"0x%08x  0x%08x  %c\n"
+
+# Header comments that save() regenerates, so load() drops them
+HEADER_LINE = re.compile(r"#\s+(?:current_pos\s+current_status(?:\s+current_pass)?|pos\s+size\s+status)\s*")
+# Our config, embedded as "## blkcache: key=value"
+CONFIG_LINE = re.compile(r"## blkcache:\s*([^=]*?)\s*=\s*(.*)")
+# Every status byte, for validating a whole column with one bytes.translate
+STATUS_BYTES = "".join(sorted(STATUSES)).encode()
+# Maps every status byte to "s", so line-ending statuses can be counted in one pass
+STATUS_TO_S = bytes.maketrans(STATUS_BYTES, b"s" * len(STATUS_BYTES))
+# A comment line after the start of the data; a "#" mid-line is the scraped status.
+# Anchoring on the newline keeps the search a fast literal scan
+COMMENT = re.compile(r"\n[ \t]*#")
+
 log = logging.getLogger(__name__)
 
 
 def iter_filemap_ranges(filemap: FileMap):
-    """Iterate over FileMap transitions yielding (pos, size, status) tuples."""
-    if not filemap.transitions:
-        return
-
-    # Process transitions to yield ranges
-    for i in range(len(filemap.transitions) - 1):
-        start = filemap.transitions[i][0]
-        end = filemap.transitions[i + 1][0] - 1
-        status = filemap.transitions[i][2]
+    """Iterate over FileMap runs yielding (pos, size, status) tuples, one per run."""
+    # FileMap keeps runs canonical (no empty or repeated runs), so each run is already
+    # one ddrescue range and the whole walk can stay in C. The exception is a zero-size
+    # map, whose single run is empty
+    if not filemap.size:
+        return iter(())
+    positions, statuses = filemap.arrays
+    return zip(positions, map(operator.sub, positions[1:], positions), statuses.decode("latin-1"))
 
-        size = end - start + 1
-        if size > 0:  # Skip zero-length ranges
-            yield (start, size, status)
 
+def load_header(file, comments: list[str], config: dict[str, str]) -> int | None:
+    """Read only the comments, config and pass number, stopping before the ranges."""
+    pass_, _ = _load_header(iter(file), comments, config)
+    return pass_
 
-def load(file, comments: List[str], filemap: FileMap, config: Dict[str, str]) -> None:
-    """Load ddrescue mapfile from file-like object, updating provided containers."""
-    current_pos_line_found = False
 
-    for line in file:
+def _load_header(lines, comments: list[str], config: dict[str, str]) -> tuple[int | None, str | None]:
+    """Consume header lines; return (pass number, first data line if it had to be read)."""
+    for line in lines:
         line = line.strip()
         if not line:
             continue
 
-        if line.startswith("## blkcache:"):
-            # Process blkcache config comments
-            config_line = line[12:].strip()
-            key, value = config_line.split("=", 1)
-            config[key.strip()] = value.strip()
-
-        elif line.startswith("#"):
-            # Skip comment headers we'll regenerate
-            if "current_pos" in line and "current_status" in line and "current_pass" in line:
-                continue
-            if " pos " in line and " size " in line and " status" in line:
-                continue
-
-            # Add to comment lines
-            comments.append(line)
-
-        elif not current_pos_line_found and len(line.split()) >= 3:
-            # First non-comment, non-config line is the current_pos line
-            parts = line.split()
+        if line.startswith("#"):
+            _load_comment(line, comments, config)
+            continue
+
+        # First non-comment, non-config line is the current_pos line
+        parts = line.split()
+        if len(parts) >= 3:
             try:
                 # Parse but ignore current_pos and current_status - we compute them
-                filemap.pass_ = int(parts[2])
-                current_pos_line_found = True
-            except (ValueError, IndexError):
-                # If we can't parse this line, assume it's a normal data line
-                start, size, status = parse_status(line)
-                filemap[start : start + size] = status
+                return int(parts[2]), None
+            except ValueError:
+                pass  # Not a pass number, so there's no header and this is a data line
+        elif len(parts) == 2 and parts[1] in STATUSES:
+            return None, None  # Older ddrescue's current_pos line, with no pass
+        return None, line
 
-        else:
-            # Process normal data lines
-            start, size, status = parse_status(line)
-            filemap[start : start + size] = status
+    return None, None
+
+
+def load(file, comments: list[str], filemap: FileMap, config: dict[str, str]) -> None:
+    """Load ddrescue mapfile from file-like object, updating provided containers."""
+    # Header: comments and config up to the current_pos line
+    pass_, first = _load_header(iter(file), comments, config)
+    if pass_ is not None:
+        filemap.pass_ = pass_
+
+    # Data: everything else is ranges. Without comments mixed in, split the lot
+    # at once and parse it column by column, keeping the per-range work in C
+    rest = file.read()
+    if first is not None:
+        rest = f"{first}\n{rest}"  # there was no header, so that line was data
+    while rest.lstrip(" \t").startswith("#"):
+        # Comments before the first range, normally just the "#  pos  size  status" header
+        line, _, rest = rest.partition("\n")
+        _load_comment(line.strip(), comments, config)
+    if not COMMENT.search(rest):
+        columns = _parse_columns(rest)
+        if columns is not None:
+            filemap.set_columns(*columns)
+            return
+
+    # Otherwise line by line, so comments are kept and errors point at a line
+    ranges = []
+    append = ranges.append
+    for line in rest.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0][0] == "#":
+            _load_comment(line.strip(), comments, config)
+            continue
+        start, size, status = _parse_parts(parts, line)
+        append((start, start + size, status))
+
+    # Apply all the data lines at once - mapfiles are sorted so this is one pass
+    filemap.set_ranges(ranges)
+
+
+def _parse_columns(rest: str) -> tuple[list[int], list[int], str] | None:
+    """Parse the data section column by column into starts, stops and statuses; None if it doesn't fit."""
+    tokens = rest.split()
+    statuses = "".join(tokens[2::3])
+    # Each status must be one valid character: deleting the valid bytes leaves nothing
+    if len(tokens) % 3 or 3 * len(statuses) != len(tokens) or not statuses.isascii():
+        return None
+    if statuses.encode().translate(None, STATUS_BYTES) or not _one_range_per_line(rest, len(statuses)):
+        return None
+    try:
+        starts = list(map(int, tokens[0::3], repeat(16)))
+        stops = list(map(operator.add, starts, map(int, tokens[1::3], repeat(16))))
+    except ValueError:
+        return None
+    return starts, stops, statuses
+
+
+def _one_range_per_line(rest: str, count: int) -> bool:
+    """
+    Whether rest is count lines that each end in a status character.
+
+    The flat token list loses the line breaks, so misaligned lines could still
+    parse into columns. A status can't appear inside the hex fields, so with the
+    columns checked this means each line holds exactly one range. Blank lines,
+    trailing blanks and CRs fail it too, and are left to the line parser.
+    """
+    shape = rest.encode().translate(STATUS_TO_S)
+    if shape and not shape.endswith(b"\n"):
+        shape += b"\n"
+    return shape.count(b"\n") == count and shape.count(b"s\n") == count
+
+
+def _load_comment(line: str, comments: list[str], config: dict[str, str]) -> None:
+    """Sort a comment line into config, regenerated headers, or kept comments."""
+    if line.startswith("## blkcache:"):
+        # Process blkcache config comments
+        match = CONFIG_LINE.fullmatch(line)
+        if not match:
+            raise ValueError(f"Invalid blkcache config line: {line}")
+        config[match[1]] = match[2]
+    elif not HEADER_LINE.fullmatch(line):
+        # Add to comment lines
+        comments.append(line)
 
 
 def save(
     file,
-    comments: List[str],
+    comments: list[str],
     filemap: FileMap,
-    config: Dict[str, str],
+    config: dict[str, str],
 ) -> None:
     """Save ddrescue mapfile to file-like object from provided containers."""
-    log.debug("Saving ddrescue format with %d transitions", len(filemap.transitions))
+    log.debug("Saving ddrescue format for %d bytes", filemap.size)
 
     file.seek(0)
     file.truncate()
 
     # Comments come first
-    for comment in comments:
-        file.write(f"{comment}\n")
+    lines = [f"{comment}\n" for comment in comments]
 
     # Embed our config into comments
-    for key, val in sorted(config.items()):
-        file.write(f"## blkcache: {key}={val}\n")
+    lines.extend(f"## blkcache: {key}={val}\n" for key, val in sorted(config.items()))
 
     # Write the main header
-    file.write("# current_pos   current_status  current_pass\n")
-    file.write(f"0x{filemap.pos:x}    {filemap.status}  {filemap.pass_}\n")
-
-    # Write transition data
-    file.write("#  pos  size  status\n")
-    for pos, size, status in iter_filemap_ranges(filemap):
-        file.write(f"0x{pos:08x}  0x{size:08x}  {status}\n")
+    lines.append("# current_pos   current_status  current_pass\n")
+    lines.append(f"0x{filemap.pos:x}    {filemap.status}  {filemap.pass_}\n")
+
+    # Then the transition data; the whole file goes out in one write
+    lines.append("#  pos  size  status\n")
+    lines.append(_format_ranges(filemap))
+    file.write("".join(lines))
+
+
+def _format_ranges(filemap: FileMap) -> str:
+    """Format every run as a data line, straight from the FileMap's raw arrays."""
+    if not filemap.size:
+        return ""  # The one run of an empty map is empty, and ddrescue has no zero-size ranges
+    positions, statuses = filemap.arrays
+    # FileMap keeps runs canonical (no empty or repeated runs), so there's nothing to merge
+    sizes = list(map(operator.sub, positions[1:], positions))
+    # Interleave the columns and format every line in a single % call, not one per line
+    fields = [None] * (3 * len(sizes))
+    fields[0::3] = positions[:-1]
+    fields[1::3] = sizes
+    fields[2::3] = statuses[:-1]
+    return ((RANGE_LINE * len(sizes)) % tuple(fields)).decode("latin-1")
 
 
 def parse_status(line: str) -> tuple[int, int, str]:
     """Parse a status line returning (start, size, status)."""
-    parts = line.split()
+    return _parse_parts(line.split(), line)
+
+
+def _parse_parts(parts: list[str], line: str) -> tuple[int, int, str]:
+    """Parse the already split fields of a status line."""
     # Let it crash if not enough parts or invalid format
     start = int(parts[0], 16)
     size = int(parts[1], 16)
@@ -5,6 +5,8 @@ AtomicFile prevents corruption of small files that are written often,
 like ddrescue map files, by writing to "name~" then moving into place.
 """
 
+import os
+import shutil
 from pathlib import Path
 
 from .base import File
@@ -13,8 +15,9 @@ from .base import File
 class AtomicFile(File):
     """File with atomic write operations via temporary files."""
 
-    def __init__(self, path: Path | str, mode: str = "rb"):
+    def __init__(self, path: Path | str, mode: str = "rb", durable: bool = True):
         super().__init__(path, mode)
+        self.durable = durable  # sync before the rename; without it the swap is atomic but may not survive power loss
         self._temp_path = None
 
     @staticmethod
@@ -26,7 +29,11 @@ class AtomicFile(File):
         if "w" in self.mode or "+" in self.mode:
             # For write modes, create temporary file
             self._temp_path = self.path.with_name(f"{self.path.name}~")
-            self._f = self._stack.enter_context(self._temp_path.open(self.mode))
+            if "a" in self.mode or "r" in self.mode:
+                # Appends and updates start from the current contents; copyfile uses sendfile where it can
+                self._copy_original()
+            self._f = self._stack.enter_context(self._temp_path.open(self.mode, buffering=self._buffering()))
+            self._fd = self._f.fileno()
         else:
             # For read-only modes, just open normally
             super().__enter__()
@@ -34,15 +41,38 @@ class AtomicFile(File):
         return self
 
     def __exit__(self, *args):
+        if self.durable and self._temp_path and args[0] is None:
+            self._f.flush()
+            # Only the data and size need to reach disk before the rename, not timestamps
+            getattr(os, "fdatasync", os.fsync)(self._fd)
+        self._fd = None
         result = self._stack.__exit__(*args)
 
         # Handle atomic replacement on successful write
         if self._temp_path and args[0] is None:
             # Success - move temp file to final location
             self._temp_path.replace(self.path)
-        elif self._temp_path and self._temp_path.exists():
+            if self.durable:
+                self._sync_dir()
+        elif self._temp_path:
             # Error occurred - clean up temp file
-            self._temp_path.unlink()
+            self._temp_path.unlink(missing_ok=True)
 
         self._temp_path = None
         return result
+
+    def _copy_original(self) -> None:
+        """Seed the temp file with the target, if there is one to append to."""
+        try:
+            shutil.copyfile(self.path, self._temp_path)
+        except FileNotFoundError:
+            if "a" not in self.mode:
+                raise  # r+ needs an existing file, same as a plain open
+
+    def _sync_dir(self) -> None:
+        """Make the rename itself durable."""
+        fd = os.open(self.path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -1,15 +1,58 @@
+import errno
 import hashlib
+import logging
+import mmap
+import os
 from contextlib import ExitStack
 from pathlib import Path
 
+# os.pread/os.pwrite are POSIX only; elsewhere we fall back to seek + read/write
+HAVE_PREAD = hasattr(os, "pread") and hasattr(os, "pwrite")
+HAVE_PREADV = hasattr(os, "preadv")
+HAVE_COPY_FILE_RANGE = hasattr(os, "copy_file_range")
+
+# Access pattern hints, None where the platform doesn't have them
+FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", None)
+FADV_RANDOM = getattr(os, "POSIX_FADV_RANDOM", None)
+FADV_WILLNEED = getattr(os, "POSIX_FADV_WILLNEED", None)
+FADV_DONTNEED = getattr(os, "POSIX_FADV_DONTNEED", None)
+
+# Bypass the page cache entirely, None where the platform doesn't have it
+O_DIRECT = getattr(os, "O_DIRECT", None)
+
+# Find the allocated extents of sparse files, None where the platform doesn't have it
+SEEK_DATA = getattr(os, "SEEK_DATA", None)
+# copy_file_range errors meaning "not between these files", as opposed to I/O errors
+COPY_REFUSED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF}
+
+log = logging.getLogger(__name__)
+
+
+def fadvise(fd: int | None, offset: int, length: int, advice: int | None) -> None:
+    """Pass an access pattern hint to the kernel. Hints never fail I/O."""
+    if advice is None or fd is None:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def is_zero(data: bytes) -> bool:
+    """Whether data is all zero bytes. The end bytes catch most real data before the scan."""
+    return not data or (data[0] == 0 and data[-1] == 0 and data.count(0) == len(data))
+
 
 class File:
     """Base file class with position-independent read/write operations."""
 
-    def __init__(self, path: Path | str, mode: str):
+    def __init__(self, path: Path | str, mode: str, direct: bool = False):
         self.path = Path(path)
         self.mode = mode
+        self.direct = direct  # Ask for O_DIRECT I/O; only honoured for rb and r+b
         self._f = None
+        self._fd = None
+        self._direct = False  # Whether the open file really is O_DIRECT
         self._stack = ExitStack()
         self._dependencies = []
 
@@ -23,8 +66,8 @@ class File:
         self.is_rotational = False
         self.can_multi_conn = False
 
-        # Compute sector size once
-        self.sector_size = self._get_sector_size()
+        # Probed on first use, then remembered
+        self._sector_size = None
 
     @staticmethod
     def check(path: Path) -> bool:
@@ -39,39 +82,225 @@ class File:
     def __enter__(self):
         for dep in self._dependencies:
             self._stack.enter_context(dep)
-        self._f = self._stack.enter_context(self.path.open(self.mode))
+        self._f = self._stack.enter_context(self._open())
+        # Keep the raw descriptor for the lifetime of the context so hot paths
+        # and ioctls don't have to go back through the file object for it
+        self._fd = self._f.fileno()
         return self
 
     def __exit__(self, *args):
+        self._fd = None
+        self._direct = False
         return self._stack.__exit__(*args)
 
-    def __getattr__(self, name):
-        """Delegate unknown attributes to the underlying file object."""
+    def _open(self):
+        """Open the path, with O_DIRECT if asked for and the filesystem allows it."""
+        if self.direct and O_DIRECT is not None and self.mode in ("rb", "r+b"):
+            flags = os.O_RDONLY if self.mode == "rb" else os.O_RDWR
+            try:
+                fd = os.open(self.path, flags | O_DIRECT)
+            except OSError as e:
+                log.debug("O_DIRECT refused for %s, using buffered I/O: %s", self.path, e)
+            else:
+                self._direct = True
+                return os.fdopen(fd, self.mode, buffering=0)
+        return self.path.open(self.mode, buffering=self._buffering())
+
+    def _buffering(self) -> int:
+        """Binary files are unbuffered so positional I/O never sees stale buffers."""
+        return 0 if "b" in self.mode else -1
+
+    def _opened(self):
+        """The underlying file object, which only exists inside the context."""
         if self._f is None:
             raise IOError("File not opened - use within 'with' statement")
-        return getattr(self._f, name)
+        return self._f
+
+    def _closed(self, error: TypeError) -> IOError | TypeError:
+        """
+        The error to raise for a TypeError from a syscall: not open, or the original.
+
+        Hot paths don't check for an open file up front; with no descriptor the
+        syscall itself fails, and only then do we work out why.
+        """
+        if self._fd is None:
+            return IOError("File not opened - use within 'with' statement")
+        return error
+
+    # The file object methods callers actually use, proxied explicitly: a
+    # __getattr__ fallback made every attribute miss a slow Python-level call
+
+    def read(self, size: int = -1):
+        return self._opened().read(size)
+
+    def write(self, data) -> int:
+        return self._opened().write(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._opened().seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._opened().tell()
+
+    def truncate(self, size: int | None = None) -> int:
+        return self._opened().truncate(size)
+
+    def flush(self) -> None:
+        self._opened().flush()
+
+    def fileno(self) -> int:
+        return self._opened().fileno()
 
     def pread(self, count: int, offset: int) -> bytes:
         """Read count bytes at offset without changing file position."""
-        if self._f is None:
-            raise IOError("File not opened - use within 'with' statement")
-        current = self._f.tell()
+        if self._direct:
+            return self._pread_direct(count, offset)
+        if HAVE_PREAD:
+            try:
+                data = os.pread(self._fd, count, offset)
+            except TypeError as e:
+                raise self._closed(e) from None
+            if len(data) == count or not data:
+                return data
+            # Devices and pipes may hand back less than asked for
+            return self._pread_rest(data, count, offset)
+        f = self._opened()
+        current = f.tell()
         try:
-            self._f.seek(offset)
-            return self._f.read(count)
+            f.seek(offset)
+            return f.read(count)
         finally:
-            self._f.seek(current)
+            f.seek(current)
+
+    def preadinto(self, buf, offset: int) -> int:
+        """Read into a writable buffer at offset without an intermediate bytes copy. Returns bytes read."""
+        if self._direct or not HAVE_PREADV:
+            data = self.pread(len(buf), offset)
+            buf[: len(data)] = data
+            return len(data)
+        view = memoryview(buf)
+        got = 0
+        while got < len(view):
+            try:
+                n = os.preadv(self._fd, [view[got:]], offset + got)
+            except TypeError as e:
+                raise self._closed(e) from None
+            if not n:
+                break  # EOF
+            got += n
+        return got
+
+    def _pread_rest(self, head: bytes, count: int, offset: int) -> bytes:
+        """Finish a short read into one preallocated buffer instead of concatenating."""
+        buf = bytearray(count)
+        view = memoryview(buf)
+        got = len(head)
+        view[:got] = head
+        while got < count:
+            if HAVE_PREADV:
+                n = os.preadv(self._fd, [view[got:]], offset + got)
+            else:
+                chunk = os.pread(self._fd, count - got, offset + got)
+                n = len(chunk)
+                view[got : got + n] = chunk
+            if not n:
+                break  # EOF
+            got += n
+        return bytes(view[:got])
+
+    def _pread_direct(self, count: int, offset: int) -> bytes:
+        """O_DIRECT read: widen to whole sectors and read into a page-aligned buffer."""
+        align = self.sector_size
+        start = offset - offset % align
+        stop = -(-(offset + count) // align) * align
+        with mmap.mmap(-1, stop - start) as buf:  # Anonymous maps are page-aligned
+            got = 0
+            while start + got < offset + count:
+                n = os.preadv(self._fd, [memoryview(buf)[got:]], start + got)
+                if not n:
+                    break  # EOF
+                got += n
+            return buf[offset - start : min(offset - start + count, got)]
 
     def pwrite(self, data: bytes, offset: int) -> int:
         """Write data at offset without changing file position."""
-        if self._f is None:
-            raise IOError("File not opened - use within 'with' statement")
-        current = self._f.tell()
+        if self._direct:
+            return self._pwrite_direct(data, offset)
+        if HAVE_PREAD:
+            try:
+                return os.pwrite(self._fd, data, offset)
+            except TypeError as e:
+                raise self._closed(e) from None
+        f = self._opened()
+        current = f.tell()
         try:
-            self._f.seek(offset)
-            return self._f.write(data)
+            f.seek(offset)
+            return f.write(data)
         finally:
-            self._f.seek(current)
+            f.seek(current)
+
+    def copy_range(self, dest: "File", offset: int, length: int) -> int | None:
+        """
+        Copy length bytes at offset to the same offset in dest without them leaving the kernel.
+
+        Returns how many bytes were copied, or None if the kernel can't do it for
+        these files, as for block devices or across some filesystems. Read errors
+        before anything was copied are raised.
+        """
+        if not HAVE_COPY_FILE_RANGE or self._fd is None or dest._fd is None:
+            return None
+        copied = 0
+        try:
+            while copied < length:
+                n = os.copy_file_range(self._fd, dest._fd, length - copied, offset + copied, offset + copied)
+                if not n:
+                    break  # EOF
+                copied += n
+        except OSError as e:
+            if copied:
+                return copied
+            if e.errno not in COPY_REFUSED:
+                raise
+            log.debug("copy_file_range refused for %s: %s", self.path, e)
+            return None
+        return copied
+
+    def is_hole(self, offset: int, length: int) -> bool:
+        """Whether [offset, offset + length) is unallocated in a sparse file, so already reads as zeros."""
+        if SEEK_DATA is None or self._fd is None:
+            return False
+        if offset + length > os.fstat(self._fd).st_size:
+            return False  # Past EOF there's nothing to read back, so the zeros must be written
+        try:
+            return os.lseek(self._fd, offset, SEEK_DATA) >= offset + length
+        except OSError as e:
+            # ENXIO means there's no data at all past offset
+            return e.errno == errno.ENXIO
+
+    def _pwrite_direct(self, data: bytes, offset: int) -> int:
+        """O_DIRECT write: widen to whole sectors, filling partial edge sectors from what's already there."""
+        if not data:
+            return 0
+        align = self.sector_size
+        start = offset - offset % align
+        end = offset + len(data)
+        stop = -(-end // align) * align
+        with mmap.mmap(-1, stop - start) as buf:  # Anonymous maps are page-aligned
+            if start < offset:
+                os.preadv(self._fd, [memoryview(buf)[:align]], start)
+            if end < stop:
+                os.preadv(self._fd, [memoryview(buf)[-align:]], stop - align)
+            buf[offset - start : end - start] = data
+            size = os.fstat(self._fd).st_size if end < stop else None
+            written = os.pwritev(self._fd, [buf], start)
+        if size is not None and size < stop:
+            # The padding after the last sector mustn't grow the file
+            os.ftruncate(self._fd, max(size, end))
+        return min(max(written - (offset - start), 0), len(data))
+
+    def advise(self, offset: int, length: int, advice: int | None) -> None:
+        """Pass an access pattern hint to the kernel. Hints never fail I/O."""
+        fadvise(self._fd, offset, length, advice)
 
     def size(self) -> int:
         """Get file size without changing file position."""
@@ -84,6 +313,17 @@ class File:
         finally:
             self._f.seek(current)
 
+    @property
+    def sector_size(self) -> int:
+        """Sector size, probed once and then remembered."""
+        if self._sector_size is None:
+            self._sector_size = self._get_sector_size()
+        return self._sector_size
+
+    @sector_size.setter
+    def sector_size(self, value: int) -> None:
+        self._sector_size = value
+
     def _get_sector_size(self) -> int:
         """Get sector size of the underlying storage device."""
         try:
@@ -5,20 +5,48 @@ CacheFile wraps another File and provides read-through caching.
 Opens the backing file in its __enter__ method.
 """
 
+import os
+from contextlib import ExitStack
 from pathlib import Path
 
-from .base import File
+from .. import ddrescue, sidecar
+from .atomic import AtomicFile
+from .base import FADV_DONTNEED, FADV_RANDOM, FADV_SEQUENTIAL, File, fadvise, is_zero
+from .filemap import CACHED, STATUS_OK, STATUS_UNTRIED, FileMap
+
+
+# How far past a sequential miss to read from the backing file
+DEFAULT_READAHEAD = 128 * 1024
+# Mapfiles are read front to back, so read them in big chunks
+MAPFILE_BUFFER = 1 << 20
 
 
 class CachedFile(File):
     """Passthrough cache that wraps another File instance."""
 
-    def __init__(self, backing_file: File, cache_file: File):
+    def __init__(
+        self,
+        backing_file: File,
+        cache_file: File,
+        readahead: int = DEFAULT_READAHEAD,
+        cache_pollute: bool = False,
+        mapfile: Path | None = None,
+    ):
         # We don't call super().__init__ because we don't have our own path
         self.backing_file = backing_file
         self.cache_file = cache_file
         self.mode = backing_file.mode
         self._f = None  # For compatibility with base File
+        self.filemap = None  # Which bytes of the cache hold real data
+        self.readahead = readahead
+        self.cache_pollute = cache_pollute  # Keep cache file pages in the kernel page cache too
+        self._next_miss = None  # Where the last backing read ended
+        self._pattern = None  # Access pattern last hinted for the backing file
+        self._copy_ahead = True  # Read ahead with copy_file_range until it turns out we can't
+        self.mapfile = mapfile  # ddrescue mapfile persisting the filemap, if any
+        self._comments = []
+        self._config = {}
+        self._dirty = False  # Filemap changed since it was last saved
 
     @staticmethod
     def check(path: Path) -> bool:
@@ -31,13 +59,23 @@ class CachedFile(File):
         return self.backing_file.path
 
     def __enter__(self):
-        # Open both backing and cache files
-        self.backing_file = self.backing_file.__enter__()
-        self.cache_file = self.cache_file.__enter__()
+        # Open both backing and cache files, closing whatever did open if anything after fails
+        with ExitStack() as stack:
+            self.backing_file = stack.enter_context(self.backing_file)
+            self.cache_file = stack.enter_context(self.cache_file)
+            self.filemap = FileMap(self.backing_file.size())
+            self._load_map()
+            stack.pop_all()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         # Close both files
+        try:
+            self.flush(durable=True)
+        finally:
+            self._close_files(exc_type, exc_val, exc_tb)
+
+    def _close_files(self, exc_type, exc_val, exc_tb):
         try:
             if self.cache_file:
                 self.cache_file.__exit__(exc_type, exc_val, exc_tb)
@@ -45,33 +83,168 @@ class CachedFile(File):
             if self.backing_file:
                 self.backing_file.__exit__(exc_type, exc_val, exc_tb)
 
+    def _load_map(self) -> None:
+        """Restore the filemap from the mapfile, if there is one."""
+        if self.mapfile is None:
+            return
+        try:
+            # ddrescue always writes '\n', so skip universal newline translation
+            with open(self.mapfile, buffering=MAPFILE_BUFFER, newline="\n") as fh:
+                fadvise(fh.fileno(), 0, 0, FADV_SEQUENTIAL)
+                if self._load_sidecar(fh):
+                    ddrescue.load_header(fh, self._comments, self._config)
+                else:
+                    ddrescue.load(fh, self._comments, self.filemap, self._config)
+        except FileNotFoundError:
+            pass
+        self._dirty = False
+
+    def _load_sidecar(self, mapfile) -> bool:
+        """Load the binary sidecar instead of parsing ranges, if it's at least as new as the mapfile."""
+        try:
+            with open(sidecar.path_for(self.mapfile), "rb") as fh:
+                if os.fstat(fh.fileno()).st_mtime_ns < os.fstat(mapfile.fileno()).st_mtime_ns:
+                    return False
+                return sidecar.load(fh, self.filemap)
+        except FileNotFoundError:
+            return False
+
+    def flush(self, durable: bool = False) -> None:
+        """
+        Save the filemap, but only if it changed since the last save.
+
+        Saves are always atomic; durable ones also fsync, which is only worth
+        paying for on close rather than for every snapshot.
+        """
+        if not self._dirty or self.mapfile is None:
+            return
+        # Recorded so the next open can skip probing the device for it
+        self._config["block_size"] = str(self.sector_size)
+        with AtomicFile(self.mapfile, "w", durable) as fh:
+            ddrescue.save(fh, self._comments, self.filemap, self._config)
+        # Written second, so it's never older than the mapfile it mirrors
+        with AtomicFile(sidecar.path_for(self.mapfile), "wb", durable) as fh:
+            sidecar.save(fh, self.filemap)
+        self._dirty = False
+
     def size(self) -> int:
-        """Get size from backing file."""
-        return self.backing_file.size()
+        """Size of the backing file, as measured once at open."""
+        return self.filemap.size
 
     @property
     def sector_size(self) -> int:
-        """Get sector size from backing file."""
+        """Block size recorded in the mapfile config, else probed from the backing file."""
+        recorded = self._config.get("block_size")
+        if recorded:
+            return int(recorded)
         return self.backing_file.sector_size
 
     def pread(self, count: int, offset: int) -> bytes:
-        """Read with cache - try cache first, then backing file."""
-        try:
-            # Try reading from cache first
-            data = self.cache_file.pread(count, offset)
-            if len(data) == count:
-                return data
-        except (IOError, OSError):
-            pass  # Cache miss or error, fall through to backing file
+        """Read with cache - one read per contiguous cached or uncached run."""
+        end = min(offset + count, self.filemap.size)
+        if offset >= end:
+            return b""
 
-        # Read from backing file
-        data = self.backing_file.pread(count, offset)
+        # Fast path: the whole request sits inside one cached run
+        _, run_stop, status = self.filemap.run_at(offset)
+        if status in CACHED and run_stop >= end:
+            return self.cache_file.pread(end - offset, offset)
 
-        # Update cache
-        self.cache_file.pwrite(data, offset)
+        buf = bytearray(end - offset)
+        got = self.preadinto(buf, offset)
+        return bytes(buf if got == len(buf) else memoryview(buf)[:got])
+
+    def preadinto(self, buf, offset: int) -> int:
+        """Fill buf from offset, one read per contiguous cached or uncached run. Returns bytes read."""
+        view = memoryview(buf)
+        end = min(offset + len(view), self.filemap.size)
+        for start, stop, status in self._runs(offset, end):
+            at = start - offset
+            if status in CACHED:
+                # Hits land straight in the result buffer
+                got = self.cache_file.preadinto(view[at : stop - offset], start)
+            else:
+                data = self._fill(start, stop)
+                got = len(data)
+                view[at : at + got] = data
+
+            if got < stop - start:
+                # Short read - never pad with bytes we don't have
+                return at + got
+
+        return max(end - offset, 0)
+
+    def _fill(self, start: int, stop: int) -> bytes:
+        """Copy an uncached run from the backing file into the cache, reading ahead if sequential."""
+        sequential = start == self._next_miss
+        ahead = self._readahead_end(stop) if sequential else stop
+        self._hint(FADV_SEQUENTIAL if sequential else FADV_RANDOM)
+
+        # The asked-for bytes are read on their own, so a bad sector in the read-ahead can't fail them
+        data = self.backing_file.pread(stop - start, start)
+        self._store(data, start)
+        got = len(data)
+        if ahead > stop and got == stop - start:
+            got += self._read_ahead(stop, ahead)
+
+        # We are the cache - don't let the kernel hold second copies
+        self.backing_file.advise(start, got, FADV_DONTNEED)
+        if not self.cache_pollute:
+            self.cache_file.advise(start, got, FADV_DONTNEED)
+        if got:
+            self.filemap[start : start + got] = STATUS_OK
+            self._dirty = True
+        self._next_miss = start + got
 
         return data
 
+    def _read_ahead(self, offset: int, end: int) -> int:
+        """Best-effort copy of [offset, end) into the cache. Returns how many bytes made it; errors just stop it."""
+        try:
+            if self._copy_ahead:
+                # Bytes read ahead are never looked at, so copy them inside the kernel where we can
+                copied = self.backing_file.copy_range(self.cache_file, offset, end - offset)
+                if copied is not None:
+                    return copied
+                self._copy_ahead = False  # Read ahead the plain way from now on
+            data = self.backing_file.pread(end - offset, offset)
+        except OSError:
+            return 0  # Unreadable media is left untried for when it's actually asked for
+        self._store(data, offset)
+        return len(data)
+
+    def _store(self, data: bytes, offset: int) -> None:
+        """Write backing data into the cache."""
+        if not (is_zero(data) and self.cache_file.is_hole(offset, len(data))):
+            # Zeros landing in a hole would only allocate blocks that read back the same
+            self.cache_file.pwrite(data, offset)
+
+    def _hint(self, pattern: int | None) -> None:
+        """
+        Tell the kernel how the backing file is being read, only when that changes.
+
+        The hint covers the whole file: sequential widens the kernel's readahead,
+        random turns it off so scattered misses don't drag extra sectors off slow media.
+        """
+        if pattern != self._pattern:
+            self.backing_file.advise(0, 0, pattern)
+            self._pattern = pattern
+
+    def _readahead_end(self, stop: int) -> int:
+        """Extend a miss ending at stop over the untried bytes that follow it, never into known bad ones."""
+        limit = min(stop + self.readahead, self.filemap.size)
+        if stop >= limit:
+            return stop
+        _, run_stop, status = next(self._runs(stop, limit))
+        return run_stop if status == STATUS_UNTRIED else stop
+
+    def _runs(self, offset: int, end: int):
+        """Yield (start, stop, status) for each run of equal status in [offset, end)."""
+        while offset < end:
+            _, stop, status = self.filemap.run_at(offset)
+            yield offset, min(stop, end), status
+            offset = stop
+
     def pwrite(self, data: bytes, offset: int) -> int:
         """Write through to both cache and backing file."""
         # Write to backing file first
@@ -79,6 +252,9 @@ class CachedFile(File):
 
         # Update cache
         self.cache_file.pwrite(data, offset)
+        if result:
+            self.filemap[offset : offset + result] = STATUS_OK
+            self._dirty = True
 
         return result
 
@@ -7,7 +7,6 @@ sector size detection, device sizing, and rotational status.
 
 import fcntl
 import struct
-from functools import lru_cache
 from pathlib import Path
 
 from .base import File
@@ -23,43 +22,55 @@ DEFAULT_SECTOR_SIZE = 512
 class Device(File):
     """Device file with block device operations."""
 
-    def __init__(self, path: Path | str, mode: str = "rb"):
-        super().__init__(path, mode)
+    def __init__(self, path: Path | str, mode: str = "rb", direct: bool = False):
+        super().__init__(path, mode, direct)
+        self._device_size = None  # Probed once per open
         # Update capability based on device type
         self.is_rotational = self._check_rotational()
-        # Override sector size with device-specific detection
-        self.sector_size = self._get_sector_size()
 
     @staticmethod
     def check(path: Path) -> bool:
         """Check if this is a block device."""
         return path.is_block_device()
 
+    def __enter__(self):
+        # Media may have changed since the last open
+        self._device_size = None
+        self._sector_size = None
+        return super().__enter__()
+
     def device_size(self) -> int:
+        """Get device capacity in bytes, probing only on the first call per open."""
+        if self._device_size is None:
+            self._device_size = self._probe_size()
+        return self._device_size
+
+    def _probe_size(self) -> int:
         """Get device capacity in bytes using ioctl or fallback methods."""
         try:
             # Try block device ioctl first
-            val = struct.unpack("Q", fcntl.ioctl(self._f, BLKGETSIZE64, b"\0" * 8))[0]
+            val = struct.unpack("Q", fcntl.ioctl(self._fd, BLKGETSIZE64, b"\0" * 8))[0]
             if val:
                 return val
         except OSError:
             pass
 
         # Try alternate methods
-        sys_sz = Path(f"/sys/class/block/{self.path.name}/size")
-        if sys_sz.exists():
-            return int(sys_sz.read_text()) * 512
+        try:
+            return int(Path(f"/sys/class/block/{self.path.name}/size").read_text()) * 512
+        except FileNotFoundError:
+            pass
 
         # Fall back to file size
         return self.size()
 
-    @property
-    @lru_cache(maxsize=1)
-    def sector_size(self) -> int:
+    def _get_sector_size(self) -> int:
         """Get device sector size using ioctl."""
+        if self._fd is None:
+            raise IOError("File is not open")
         try:
             # Try BLKSSZGET ioctl (works for most block devices)
-            return struct.unpack("I", fcntl.ioctl(self._f, BLKSSZGET, b"\0" * 4))[0]
+            return struct.unpack("I", fcntl.ioctl(self._fd, BLKSSZGET, b"\0" * 4))[0]
         except (OSError, IOError):
             return DEFAULT_SECTOR_SIZE
 
@@ -67,12 +78,7 @@ class Device(File):
         """Check if device uses spinning media (HDD) vs flash (SSD)."""
         try:
             # Check sys path for rotational status
-            rotational_path = Path(f"/sys/block/{self.path.name}/queue/rotational")
-            if rotational_path.exists():
-                return rotational_path.read_text().strip() == "1"
-
-            # Default: assume non-rotational for modern devices
-            return False
+            return Path(f"/sys/block/{self.path.name}/queue/rotational").read_text().strip() == "1"
         except Exception:
             # Default: assume non-rotational for modern devices
             return False
@@ -7,8 +7,12 @@ any file format dependencies.
 
 import bisect
 import logging
+import operator
+from array import array
 
-# Prevents sort (not a number, so not less, greater or equal to itself)
+# Middle field of the transition tuples handed out by FileMap. Lookups bisect the
+# integer positions list, never these tuples; the NaN just keeps them from being
+# sorted on status if a caller tries (not less, greater or equal to itself)
 NO_SORT = float("nan")
 
 # Block status codes
@@ -25,6 +29,18 @@ UNCACHED = {STATUS_UNTRIED}  # Need data
 ERROR = {STATUS_ERROR, STATUS_TRIMMED}  # Can't get data
 STATUSES = CACHED | UNCACHED | ERROR  # All valid statuses
 
+# Statuses are stored as their byte codes, so comparisons are integer compares
+UNTRIED_CODE = ord(STATUS_UNTRIED)
+BLANK_STATUSES = bytearray((UNTRIED_CODE, UNTRIED_CODE))
+# Positions are packed unsigned 64-bit ints: 8 bytes each rather than a boxed int
+# per entry, and bisect still works on them directly
+POSITION = "Q"
+# ddrescue priority order: error > untried > trimmed > slow > scraped > ok
+PRIORITY = tuple(
+    (status, ord(status))
+    for status in (STATUS_ERROR, STATUS_UNTRIED, STATUS_TRIMMED, STATUS_SLOW, STATUS_SCRAPED, STATUS_OK)
+)
+
 log = logging.getLogger(__name__)
 
 
@@ -36,25 +52,94 @@ class FileMap:
     Uses slice notation: filemap[start:end] = status
     """
 
+    # Fixed attributes: no per-instance dict, and the hot paths' self lookups are slot loads
+    __slots__ = ("size", "pass_", "_positions", "_statuses", "_pos", "_status")
+
     def __init__(self, size: int):
         """Initialize with device/file size."""
         self.size = size
         self.pass_ = 1  # ddrescue compatibility
 
-        # Transitions list: (position, NO_SORT, status)
-        # Each entry marks where status changes
+        # Transitions are stored as parallel arrays: sorted start positions and
+        # one status byte per position. Each entry marks where status changes.
         # Initialize with empty device (all untried), with a duplicate status at the end
         # for ease of insert
-        self.transitions = [(0, NO_SORT, STATUS_UNTRIED), (size, NO_SORT, STATUS_UNTRIED)]
+        self._positions = array(POSITION, (0, size))
+        self._statuses = bytearray(BLANK_STATUSES)
+        self._changed()
+
+    def _changed(self) -> None:
+        """Forget the cached pos and status; every change to the arrays must call this."""
+        self._pos = None
+        self._status = None
+
+    @property
+    def transitions(self) -> list[tuple]:
+        """Transitions as (position, NO_SORT, status) tuples."""
+        return [(pos, NO_SORT, chr(code)) for pos, code in zip(self._positions, self._statuses)]
+
+    @transitions.setter
+    def transitions(self, transitions: list[tuple]) -> None:
+        self._positions = array(POSITION, [pos for pos, _, _ in transitions])
+        self._statuses = bytearray(ord(status) for _, _, status in transitions)
+        self._changed()
+        self._compact()
+
+    @property
+    def arrays(self) -> tuple[list[int], bytes]:
+        """Copies of the raw (positions, statuses) arrays, for fast serialisation."""
+        return list(self._positions), bytes(self._statuses)
+
+    @arrays.setter
+    def arrays(self, arrays: tuple[list[int], bytes]) -> None:
+        positions, statuses = arrays
+        if len(positions) != len(statuses) or len(positions) < 2:
+            raise ValueError("Positions and statuses must be matching arrays with an end marker")
+        if positions[0] != 0 or positions[-1] != self.size:
+            raise ValueError(f"Transitions must span 0 to {self.size}")
+        self._positions = array(POSITION, positions)
+        self._statuses = bytearray(statuses)
+        self._changed()
+        self._compact()
+
+    def _compact(self) -> None:
+        """Drop empty runs and repeated statuses in one forward pass, keeping the end marker."""
+        positions, statuses = self._positions, self._statuses
+        if len(positions) < 3:
+            return
+        # Usually there's nothing to do (as with anything saved from a FileMap), and
+        # checking that is all C; only the end marker may repeat the status before it
+        if not any(map(operator.eq, positions, positions[1:])) and not any(map(operator.eq, statuses, statuses[1:-1])):
+            return
+
+        kept_positions = array(POSITION)
+        kept_statuses = bytearray()
+        for i in range(len(positions) - 1):
+            if positions[i] == positions[i + 1]:
+                continue  # empty run
+            if kept_statuses and kept_statuses[-1] == statuses[i]:
+                continue  # same as the run before
+            kept_positions.append(positions[i])
+            kept_statuses.append(statuses[i])
+
+        kept_positions.append(positions[-1])
+        kept_statuses.append(statuses[-1])
+        self._positions, self._statuses = kept_positions, kept_statuses
 
     def __setitem__(self, key, status):
         """Set status for range using slice notation: filemap[start:end] = status"""
         if isinstance(key, slice):
+            start, stop = key.start, key.stop
+            if key.step is None and type(start) is int and type(stop) is int and 0 <= start <= stop <= self.size:
+                # The usual in-bounds slice: one chained compare instead of the checks below
+                self._set_status_range(start, stop - 1, status)
+                return
+
             # Check bounds before calling indices() which clamps values
-            if key.start is not None and key.start < 0:
-                raise ValueError(f"Negative start index: {key.start}")
-            if key.stop is not None and key.stop > self.size:
-                raise ValueError(f"Stop index beyond device size: {key.stop} > {self.size}")
+            if start is not None and start < 0:
+                raise ValueError(f"Negative start index: {start}")
+            if stop is not None and stop > self.size:
+                raise ValueError(f"Stop index beyond device size: {stop} > {self.size}")
 
             start, stop, step = key.indices(self.size)
             if step != 1:
@@ -64,6 +149,122 @@ class FileMap:
             # Single offset
             self._set_status_range(key, key, status)
 
+    def set_ranges(self, ranges) -> None:
+        """
+        Set status for many (start, stop, status) ranges, applied in order.
+
+        Sorted, non-overlapping ranges on a blank map (the shape of a mapfile)
+        are built directly in one pass, as are unsorted ones that don't overlap,
+        since then order can't matter. Otherwise anything after the first range
+        that breaks that order is applied one at a time.
+        """
+        ranges = list(ranges)
+        blank = self._is_blank()
+        done = self._build_from_sorted(ranges)
+        if blank and done < len(ranges) and self._build_disjoint(ranges):
+            return
+
+        for start, stop, status in ranges[done:]:
+            self[start:stop] = status
+
+    def set_columns(self, starts: list[int], stops: list[int], statuses: str) -> None:
+        """
+        Set status for ranges given as parallel columns, as set_ranges would.
+
+        When the ranges tile one unbroken span of a blank map, as a ddrescue
+        mapfile's do, the columns become the transition arrays almost as they are.
+        """
+        if not self._tiles_blank(starts, stops):
+            self.set_ranges(zip(starts, stops, statuses))
+            return
+
+        positions = array(POSITION, starts)
+        if positions[0] > 0:
+            positions.insert(0, 0)
+            statuses = STATUS_UNTRIED + statuses
+        if stops[-1] < self.size:
+            positions.append(stops[-1])
+            statuses += STATUS_UNTRIED
+        positions.append(self.size)
+        statuses += STATUS_UNTRIED
+
+        self._positions, self._statuses = positions, bytearray(statuses, "latin-1")
+        self._changed()
+        if any(map(operator.eq, statuses, statuses[1:-1])):
+            self._compact()  # neighbours with the same status
+
+    def _tiles_blank(self, starts: list[int], stops: list[int]) -> bool:
+        """Whether this map is blank and the ranges are non-empty, in bounds and end to end."""
+        return (
+            bool(starts)
+            and self._is_blank()
+            and starts[0] >= 0
+            and stops[-1] <= self.size
+            and starts[1:] == stops[:-1]
+            and all(map(operator.lt, starts, stops))
+        )
+
+    def _is_blank(self) -> bool:
+        """Whether the whole map is one untried run."""
+        return len(self._positions) == 2 and self._positions[1] == self.size and self._statuses == BLANK_STATUSES
+
+    def _build_from_sorted(self, ranges: list[tuple[int, int, str]]) -> int:
+        """Build transitions straight from the sorted prefix of ranges. Returns how many it used."""
+        untried = UNTRIED_CODE
+        if not self._is_blank():
+            return 0
+
+        positions = array(POSITION)
+        statuses = bytearray()
+
+        def append(pos: int, code: int) -> None:
+            # Adjacent runs with the same status are one run
+            if not statuses or statuses[-1] != code:
+                positions.append(pos)
+                statuses.append(code)
+
+        cursor = 0
+        done = 0
+        for start, stop, status in ranges:
+            if start < cursor or stop > self.size:
+                break  # overlapping, unsorted or out of bounds
+            done += 1
+            if stop <= start:
+                continue
+            if cursor < start:
+                append(cursor, untried)
+            append(start, ord(status))
+            cursor = stop
+
+        if not positions:
+            return done  # nothing to set
+
+        if cursor < self.size:
+            append(cursor, untried)
+        positions.append(self.size)
+        statuses.append(untried)
+        self._positions, self._statuses = positions, statuses
+        self._changed()
+        return done
+
+    def _build_disjoint(self, ranges: list[tuple[int, int, str]]) -> bool:
+        """Rebuild from blank with ranges sorted, if none of them overlap. Returns whether it did."""
+        ordered = sorted((r for r in ranges if r[0] < r[1]), key=operator.itemgetter(0))
+        stops = [stop for _, stop, _ in ordered[:-1]]
+        if not all(map(operator.le, stops, [start for start, _, _ in ordered[1:]])):
+            return False
+
+        positions, statuses = self._positions, self._statuses
+        self._positions, self._statuses = array(POSITION, (0, self.size)), bytearray(BLANK_STATUSES)
+        self._changed()
+        if self._build_from_sorted(ordered) == len(ordered):
+            return True
+
+        # Out of bounds; put things back so the caller applies them in order and raises
+        self._positions, self._statuses = positions, statuses
+        self._changed()
+        return False
+
     def __getitem__(self, key):
         """Get status for range using slice notation: filemap[start:end] returns transitions"""
         if isinstance(key, slice):
@@ -86,112 +287,106 @@ class FileMap:
             # Single offset
             return self._get_status_at(key)
 
+    def _index_at(self, offset: int) -> int:
+        """Index of the transition covering offset."""
+        return max(0, bisect.bisect_right(self._positions, offset) - 1)
+
     def _get_transitions_range(self, start: int, end: int) -> list[tuple]:
         """Get transitions covering range with synthetic start/end positions."""
-        # Find transitions that fall within our range [start, end]
-        # We want transitions where start < transition.pos <= end
-        result = []
-
-        # Get status at start position
-        start_search = (start + 1, NO_SORT, "")
-        start_idx = bisect.bisect_left(self.transitions, start_search)
-        start_transition_idx = max(0, start_idx - 1)
-        start_status = self.transitions[start_transition_idx][2]
-
-        # Add synthetic start
-        result.append((start, NO_SORT, start_status))
-
-        # Add all transitions that fall within (start, end]
-        for i in range(len(self.transitions)):
-            pos = self.transitions[i][0]
-            if start < pos <= end:
-                result.append(self.transitions[i])
-
-        # Get status at end position (might be different from start if we crossed transitions)
-        end_search = (end + 1, NO_SORT, "")
-        end_idx = bisect.bisect_left(self.transitions, end_search)
-        end_transition_idx = max(0, end_idx - 1)
-        end_status = self.transitions[end_transition_idx][2]
-
-        # Add synthetic end
-        result.append((end, NO_SORT, end_status))
+        # Transitions that fall within our range are those where start < pos <= end
+        lo = bisect.bisect_right(self._positions, start)
+        hi = bisect.bisect_right(self._positions, end)
+
+        # The runs covering start and end sit just before those bisection points
+        statuses = self._statuses
+        result = [(start, NO_SORT, chr(statuses[max(0, lo - 1)]))]
+        result.extend((pos, NO_SORT, chr(code)) for pos, code in zip(self._positions[lo:hi], statuses[lo:hi]))
+        result.append((end, NO_SORT, chr(statuses[max(0, hi - 1)])))
 
         return result
 
     def _get_status_at(self, offset: int) -> str:
         """Get status at single offset using efficient bisect lookup."""
-        # Search for (offset + 1, ...) to find the transition that starts after offset
-        search_key = (offset + 1, NO_SORT, "")
-        idx = bisect.bisect_left(self.transitions, search_key)
+        return chr(self._statuses[self._index_at(offset)])
 
-        # The transition covering offset is at idx-1 (or 0 if idx is 0)
-        transition_idx = max(0, idx - 1)
+    def runs(self):
+        """Iterate (start, stop, status) for every run, straight off the parallel arrays."""
+        positions = self._positions
+        return zip(positions, positions[1:], self._statuses.decode("latin-1"))
 
-        return self.transitions[transition_idx][2]
+    def run_at(self, offset: int) -> tuple[int, int, str]:
+        """Get (start, stop, status) of the run of equal status containing offset."""
+        idx = self._index_at(offset)
+        return self._positions[idx], self._positions[idx + 1], chr(self._statuses[idx])
 
     def _set_status_range(self, start: int, end: int, status: str) -> None:
         """Set the status for a range of bytes."""
         log.debug("Setting status %s for range [%d, %d]", status, start, end)
 
-        start_key = (start, NO_SORT, status)
-        end_key = (end + 1, NO_SORT, STATUS_UNTRIED)
-
-        # Find indices using binary search
-        start_idx = bisect.bisect_left(self.transitions, start_key)
-        end_idx = bisect.bisect_right(self.transitions, end_key)
-
-        # Determine before and after indices
-        before_idx = max(start_idx - 1, 0)
-        after_idx = min(end_idx, len(self.transitions) - 1)
-
-        # Get the 5 variables we need
-        before_status = self.transitions[before_idx][2]  # before_start.status
-        before_pos = self.transitions[before_idx][0]  # before_start.pos
-        after_status = self.transitions[after_idx][2]  # after.status
-        after_pos = self.transitions[after_idx][0]  # after.pos
-
-        # Find before_end: what status exists at end+1 position before our change
-        before_end_idx = max(0, end_idx - 1)
-        before_end_status = self.transitions[before_end_idx][2]
-
-        splice = []
-        if before_pos == start:
-            # overwrite the start position
-            splice.append(start_key)
-        else:
-            splice.append((before_pos, NO_SORT, before_status))
-            if before_status != status:
-                # if the status is different, we need to add a new entry
-                splice.append(start_key)
-
-        if before_end_status != status or end_idx == len(self.transitions):
-            splice.append((end + 1, NO_SORT, before_end_status))
-        if end + 1 < after_pos:
-            splice.append((after_pos, NO_SORT, after_status))
-
-        self.transitions[before_idx : after_idx + 1] = splice
+        stop = end + 1
+        if stop <= start:
+            return
+
+        positions, statuses = self._positions, self._statuses
+        code = ord(status)
+
+        # Runs containing the first byte and the byte just after the range
+        lo = self._index_at(start)
+        if statuses[lo] == code and lo + 1 < len(positions) and positions[lo + 1] >= stop:
+            return  # already all this status, as when re-marking cached data
+        # A range inside one run, as a single byte nearly always is, resumes that run: no second bisect
+        hi = lo if lo + 1 < len(positions) and positions[lo + 1] > stop else self._index_at(stop)
+        after = statuses[hi]  # status that resumes at stop
+
+        splice_positions = array(POSITION)
+        splice_statuses = bytearray()
+
+        if positions[lo] < start:
+            # keep the start of the run we cut into
+            splice_positions.append(positions[lo])
+            splice_statuses.append(statuses[lo])
+            if statuses[lo] != code:
+                splice_positions.append(start)
+                splice_statuses.append(code)
+        elif lo == 0 or statuses[lo - 1] != code:
+            # otherwise the run before us already has this status and just grows
+            splice_positions.append(start)
+            splice_statuses.append(code)
+
+        if after != code or stop == self.size:
+            # the end marker always stays
+            splice_positions.append(stop)
+            splice_statuses.append(after)
+
+        positions[lo : hi + 1] = splice_positions
+        statuses[lo : hi + 1] = splice_statuses
+        self._changed()
 
     @property
     def pos(self) -> int:
-        """Current position - first untried byte."""
-        for position, _, status in self.transitions:
-            if status == STATUS_UNTRIED:
-                return position
-        raise ValueError("FileMap transitions corrupted.")
+        """Current position - first untried byte. Found once per change, so polling is cheap."""
+        if self._pos is None:
+            idx = self._statuses.find(UNTRIED_CODE)
+            if idx < 0:
+                raise ValueError("FileMap transitions corrupted.")
+            self._pos = self._positions[idx]
+        return self._pos
 
     @property
     def status(self) -> str:
-        """Current status - highest priority status found in transitions."""
-        if len(self.transitions) < 2:
+        """Current status - highest priority status found in transitions. Found once per change."""
+        if self._status is None:
+            self._status = self._find_status()
+        return self._status
+
+    def _find_status(self) -> str:
+        """Scan for the highest priority status, ignoring the end marker."""
+        if len(self._statuses) < 2:
             raise ValueError("FileMap transitions corrupted")
 
-        # ddrescue priority order: error > untried > trimmed > slow > scraped > ok
-        priority_order = [STATUS_ERROR, STATUS_UNTRIED, STATUS_TRIMMED, STATUS_SLOW, STATUS_SCRAPED, STATUS_OK]
-
-        statuses = {self.transitions[i][2] for i in range(len(self.transitions) - 1)}
-
-        for status in priority_order:
-            if status in statuses:
+        last = len(self._statuses) - 1
+        for status, code in PRIORITY:
+            if self._statuses.find(code, 0, last) >= 0:
                 return status
 
         raise ValueError("FileMap transitions corrupted")
@@ -5,18 +5,31 @@ MappedFile uses mmap for efficient access to regular files.
 Only works with regular files that support memory mapping.
 """
 
+import hashlib
 import mmap
 from pathlib import Path
 
-from .base import File
+from .base import FADV_DONTNEED, FADV_RANDOM, FADV_SEQUENTIAL, FADV_WILLNEED, File
+
+# posix_fadvise hints and their madvise equivalents for mapped pages
+MADVICE = {
+    FADV_SEQUENTIAL: getattr(mmap, "MADV_SEQUENTIAL", None),
+    FADV_RANDOM: getattr(mmap, "MADV_RANDOM", None),
+    FADV_WILLNEED: getattr(mmap, "MADV_WILLNEED", None),
+    FADV_DONTNEED: getattr(mmap, "MADV_DONTNEED", None),
+}
+# Page size is always a power of two, so alignment is a mask rather than a modulo
+PAGE_MASK = ~(mmap.PAGESIZE - 1)
 
 
 class MMappedFile(File):
     """Memory-mapped file with efficient random access."""
 
-    def __init__(self, path: Path | str, mode: str = "rb"):
+    def __init__(self, path: Path | str, mode: str = "rb", prefault: bool = False):
         super().__init__(path, mode)
+        self.prefault = prefault  # Fault the whole map in at open, for callers that will read most of it
         self._mmap = None
+        self._size = 0  # Length of the mapping, which is fixed once it's made
 
     @staticmethod
     def check(path: Path) -> bool:
@@ -37,14 +50,21 @@ class MMappedFile(File):
             else:
                 access = mmap.ACCESS_READ
 
-            self._mmap = self._stack.enter_context(mmap.mmap(self._f.fileno(), 0, access=access))
+            self._mmap = self._stack.enter_context(mmap.mmap(self._fd, 0, access=access))
+            self._size = len(self._mmap)
         except (OSError, ValueError) as e:
             raise IOError(f"Cannot memory-map file {self.path}: {e}")
 
+        if self.prefault:
+            # One bulk readahead in the kernel instead of a page fault per page
+            self.advise(0, self._size, FADV_WILLNEED)
+
         return self
 
     def __exit__(self, *args):
-        return self._stack.__exit__(*args)
+        self._mmap = None
+        self._size = 0
+        return super().__exit__(*args)
 
     def pread(self, count: int, offset: int) -> bytes:
         """Read count bytes at offset using memory map."""
@@ -52,26 +72,61 @@ class MMappedFile(File):
             raise IOError("File not opened - use within 'with' statement")
 
         # Check bounds
-        if offset < 0 or offset >= len(self._mmap):
+        size = self._size
+        if offset < 0 or offset >= size:
             return b""
 
-        end = min(offset + count, len(self._mmap))
+        end = min(offset + count, size)
         return self._mmap[offset:end]
 
+    def preadinto(self, buf, offset: int) -> int:
+        """Copy straight from the mapping into buf."""
+        if self._mmap is None:
+            raise IOError("File not opened - use within 'with' statement")
+        end = min(offset + len(buf), self._size)
+        if offset < 0 or offset >= end:
+            return 0
+        # Release the export promptly, or the map can't be closed
+        with memoryview(self._mmap) as mapped:
+            memoryview(buf)[: end - offset] = mapped[offset:end]
+        return end - offset
+
     def pwrite(self, data: bytes, offset: int) -> int:
         """Write data at offset using memory map."""
         if self._mmap is None:
             raise IOError("File not opened - use within 'with' statement")
 
-        if self._mmap.access == mmap.ACCESS_READ:
+        if not self.can_write:
             raise IOError("File opened in read-only mode")
 
         # Write and let it crash if we go past bounds
         self._mmap[offset : offset + len(data)] = data
         return len(data)
 
+    def advise(self, offset: int, length: int, advice: int | None) -> None:
+        """Hint the kernel about mapped pages; the fd hint alone doesn't reach them."""
+        madvice = MADVICE.get(advice)
+        if madvice is None or self._mmap is None:
+            return
+        # madvise wants a page-aligned start
+        start = offset & PAGE_MASK
+        length = min(offset + length, self._size) - start
+        if length <= 0:
+            return
+        try:
+            self._mmap.madvise(madvice, start, length)
+        except (OSError, ValueError):
+            pass
+
+    def fingerprint(self, head: int = 65_536) -> str:
+        """Hash the header straight out of the mapping, without copying it first."""
+        if self._mmap is None:
+            raise IOError("File not opened - use within 'with' statement")
+        with memoryview(self._mmap) as mapped:
+            return hashlib.sha1(mapped[:head]).hexdigest()[:8]
+
     def size(self) -> int:
         """Get file size from memory map."""
         if self._mmap is None:
             raise IOError("File not opened - use within 'with' statement")
-        return len(self._mmap)
+        return self._size
@@ -10,7 +10,6 @@ import logging
 import struct
 import threading
 import time
-from functools import lru_cache
 from pathlib import Path
 
 from .device import Device, BLKSSZGET, DEFAULT_SECTOR_SIZE
@@ -25,10 +24,9 @@ DEFAULT_CDROM_SECTOR_SIZE = 2048
 class Removable(Device):
     """Removable device with media change detection."""
 
-    def __init__(self, path: Path | str, mode: str = "rb"):
-        super().__init__(path, mode)
-        # Optical drives and floppy disks are rotational
-        self.is_rotational = self._is_optical() or self._is_floppy()
+    def _check_rotational(self) -> bool:
+        """Optical drives and floppy disks are rotational; no need to ask sysfs."""
+        return self._is_optical() or self._is_floppy()
 
     def _is_optical(self) -> bool:
         """Check if this is an optical drive (CD/DVD)."""
@@ -44,10 +42,8 @@ class Removable(Device):
 
         # Check for USB floppies via sysfs
         try:
-            model_path = Path(f"/sys/block/{device_name}/device/model")
-            if model_path.exists():
-                model = model_path.read_text().strip().lower()
-                return "floppy" in model or "fd" in model
+            model = Path(f"/sys/block/{device_name}/device/model").read_text().strip().lower()
+            return "floppy" in model or "fd" in model
         except Exception:
             pass
 
@@ -60,29 +56,25 @@ class Removable(Device):
             return False
 
         # Check /sys/block for removable flag
-        removable_path = Path(f"/sys/block/{path.name}/removable")
-        if removable_path.exists():
-            try:
-                return removable_path.read_text().strip() == "1"
-            except (OSError, IOError):
-                pass
+        try:
+            return Path(f"/sys/block/{path.name}/removable").read_text().strip() == "1"
+        except (OSError, IOError):
+            pass
 
         p = str(path)
         return p.startswith("/dev/") and ("sr" in p or "cd" in p)
 
-    @property
-    @lru_cache(maxsize=1)
-    def sector_size(self) -> int:
+    def _get_sector_size(self) -> int:
         """Get sector size with CDROM-specific ioctl support."""
-        if self._f is None:
+        if self._fd is None:
             raise IOError("File is not open")
         try:
             # Try standard block device ioctl first
-            return struct.unpack("I", fcntl.ioctl(self._f, BLKSSZGET, b"\0" * 4))[0]
+            return struct.unpack("I", fcntl.ioctl(self._fd, BLKSSZGET, b"\0" * 4))[0]
         except (OSError, IOError):
             try:
                 # Try CDROM_GET_BLKSIZE for optical media
-                return struct.unpack("I", fcntl.ioctl(self._f, CDROM_GET_BLKSIZE, b"\0" * 4))[0]
+                return struct.unpack("I", fcntl.ioctl(self._fd, CDROM_GET_BLKSIZE, b"\0" * 4))[0]
             except (OSError, IOError):
                 # Default for optical media based on device name
                 if "sr" in str(self.path) or "cd" in str(self.path):
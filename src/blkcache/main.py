@@ -24,6 +24,11 @@ def _parse(argv=None) -> argparse.Namespace:
         "-k", "--keep-cache", action="store_true", default=True, help="keep *.cache.<id>~ after exit (default: True)"
     )
     p.add_argument("--no-keep-cache", dest="keep_cache", action="store_false", help="delete *.cache.<id>~ after exit")
+    p.add_argument(
+        "--preallocate",
+        action="store_true",
+        help="allocate the whole cache file up front instead of leaving it sparse",
+    )
     p.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
     p.add_argument("device")  # /dev/sr0 …
     p.add_argument("iso")  # symlink clients read
@@ -76,7 +81,7 @@ def main(argv=None) -> None:
                 break
             if shutdown_requested:
                 break
-            server.serve(dev, iso, args.block_size, args.keep_cache, log, lambda: shutdown_requested)
+            server.serve(dev, iso, args.block_size, args.keep_cache, log, lambda: shutdown_requested, args.preallocate)
             if not shutdown_requested:
                 log.info("waiting for next disc …")
     except KeyboardInterrupt:
@@ -2,6 +2,7 @@
 
 import contextlib
 import logging
+import os
 import shutil
 import subprocess
 import tempfile
@@ -9,7 +10,7 @@ import threading
 import time
 from pathlib import Path
 
-from blkcache.file.device import Device
+from blkcache import sidecar
 from blkcache.file.removable import Removable
 
 
@@ -17,6 +18,37 @@ def _cache_name(out_iso: Path, disc: str) -> Path:
     return out_iso.with_suffix(f"{out_iso.suffix}.cache.{disc}~")
 
 
+def _mapfile_name(out_iso: Path, disc: str) -> Path:
+    return out_iso.with_suffix(f"{out_iso.suffix}.map.{disc}~")
+
+
+def _remove_mapfile(mapfile: Path) -> None:
+    mapfile.unlink(missing_ok=True)
+    sidecar.path_for(mapfile).unlink(missing_ok=True)
+
+
+def _create_cache(cache: Path, size: int, preallocate: bool, log: logging.Logger) -> bool:
+    """Create a cache file of the device's size, unless we're resuming with one. Returns whether it's new."""
+    try:
+        with cache.open("xb") as fh:
+            fh.truncate(size)
+            if preallocate:
+                try:
+                    # Allocate contiguous extents up front rather than scattering them across random fills
+                    os.posix_fallocate(fh.fileno(), 0, size)
+                except OSError as e:
+                    log.warning("Couldn't preallocate %s, leaving it sparse: %s", cache, e)
+    except FileExistsError:
+        return False  # Resuming with an existing cache
+    return True
+
+
+def _start_cache(cache: Path, mapfile: Path, size: int, preallocate: bool, log: logging.Logger) -> None:
+    """Create or resume the cache, dropping any mapfile that can't describe it."""
+    if _create_cache(cache, size, preallocate, log):
+        _remove_mapfile(mapfile)  # Left over from a cache that's gone, so it describes nothing
+
+
 @contextlib.contextmanager
 def _workspace(log: logging.Logger):
     tmp = Path(tempfile.mkdtemp(prefix="blkcache_"))
@@ -59,14 +91,22 @@ def _wait(path: Path, log: logging.Logger, t: float = 10.0, process=None) -> Non
     log.debug("ready: %s", path)
 
 
-def serve(dev: Path, iso: Path, block: int, keep_cache: bool, log: logging.Logger, shutdown_check=None) -> None:
+def serve(
+    dev: Path,
+    iso: Path,
+    block: int,
+    keep_cache: bool,
+    log: logging.Logger,
+    shutdown_check=None,
+    preallocate: bool = False,
+) -> None:
+    # One handle for both the fingerprint and the size probe
     with Removable(dev, "rb") as device:
         disc = device.fingerprint()
+        size = device.device_size()
     cache = _cache_name(iso, disc)
-    if not cache.exists():
-        with cache.open("wb") as fh:
-            with Device(dev, "rb") as device:
-                fh.truncate(device.device_size())
+    mapfile = _mapfile_name(iso, disc)
+    _start_cache(cache, mapfile, size, preallocate, log)
 
     with _workspace(log) as (tmp, mnt):
         sock = tmp / "nbd.sock"
@@ -83,6 +123,7 @@ def serve(dev: Path, iso: Path, block: int, keep_cache: bool, log: logging.Logge
             str(Path(__file__).with_name("backend.py")),
             f"device={dev}",
             f"cache={cache}",
+            f"mapfile={mapfile}",
         ]
 
         # Add block size argument only if explicitly specified
@@ -160,5 +201,6 @@ def serve(dev: Path, iso: Path, block: int, keep_cache: bool, log: logging.Logge
             nbdkit.wait()
             if not keep_cache:
                 cache.unlink(missing_ok=True)
+                _remove_mapfile(mapfile)
             if iso.is_symlink():
                 iso.unlink(missing_ok=True)
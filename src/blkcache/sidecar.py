@@ -0,0 +1,67 @@
+"""
+Binary FileMap sidecar loading and saving.
+
+A compact companion to the ddrescue mapfile: the FileMap's transition arrays
+written as raw little-endian integers and status bytes, so it can be reloaded
+without parsing text. The ddrescue mapfile stays the source of truth.
+"""
+
+import operator
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from .ddrescue import STATUS_BYTES
+from .file.filemap import FileMap
+
+MAGIC = b"BLKMAP01"
+
+# size, pass, number of transitions
+HEADER = struct.Struct("<QQQ")
+
+
+def path_for(mapfile: Path) -> Path:
+    """Where the sidecar for a ddrescue mapfile lives."""
+    return mapfile.with_name(f"{mapfile.name}.blkcache")
+
+
+def save(file, filemap: FileMap) -> None:
+    """Write filemap to a binary file-like object."""
+    positions, statuses = filemap.arrays
+    packed = array("Q", positions)
+    if sys.byteorder != "little":
+        packed.byteswap()
+
+    file.write(b"".join([MAGIC, HEADER.pack(filemap.size, filemap.pass_, len(positions)), packed.tobytes(), statuses]))
+
+
+def load(file, filemap: FileMap) -> bool:
+    """Fill filemap from a binary file-like object. Returns False if it doesn't fit this map."""
+    data = file.read()
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + HEADER.size:
+        return False
+
+    size, pass_, count = HEADER.unpack_from(data, len(MAGIC))
+    body = len(MAGIC) + HEADER.size
+    if size != filemap.size or len(data) != body + count * 9:
+        return False
+
+    # Slice through a view so the columns are copied once, into the map, not twice
+    view = memoryview(data)
+    positions = array("Q")
+    positions.frombytes(view[body : body + count * 8])
+    if sys.byteorder != "little":
+        positions.byteswap()
+    statuses = view[body + count * 8 :]
+
+    # Damage that keeps the length intact: every status valid, positions never going backwards
+    if bytes(statuses).translate(None, STATUS_BYTES) or any(map(operator.gt, positions, positions[1:])):
+        return False
+
+    try:
+        filemap.arrays = positions, statuses
+    except ValueError:
+        return False
+    filemap.pass_ = pass_
+    return True
@@ -0,0 +1,69 @@
+"""Test AtomicFile's write-then-rename behaviour."""
+
+import os
+
+import pytest
+
+from blkcache.file.atomic import AtomicFile
+
+
+@pytest.mark.parametrize("durable", [False, True])
+def test_replaces_on_success(tmp_path, durable):
+    """The target only changes once the write completes."""
+    path = tmp_path / "map.log"
+    path.write_text("old")
+
+    with AtomicFile(path, "w", durable) as f:
+        f.write("new")
+        assert path.read_text() == "old"
+
+    assert path.read_text() == "new"
+    assert not (tmp_path / "map.log~").exists()
+
+
+def test_keeps_original_on_error(tmp_path):
+    """A failed write leaves the old file and no temp file behind."""
+    path = tmp_path / "map.log"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError), AtomicFile(path, "w", durable=True) as f:
+        f.write("half")
+        raise RuntimeError
+
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["map.log"]
+
+
+def test_durable_syncs(tmp_path, monkeypatch):
+    """Writes sync the data and the directory by default; opting out skips both."""
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    monkeypatch.setattr(os, "fdatasync", synced.append, raising=False)
+
+    with AtomicFile(tmp_path / "a", "wb", durable=False) as f:
+        f.write(b"x")
+    assert synced == []
+
+    with AtomicFile(tmp_path / "b", "wb") as f:
+        f.write(b"x")
+    assert len(synced) == 2
+
+
+@pytest.mark.parametrize("mode, expected", [("a", "old+new"), ("r+", "new")])
+def test_keeps_existing_contents(tmp_path, mode, expected):
+    """Append and update modes start from the current file rather than an empty one."""
+    path = tmp_path / "map.log"
+    path.write_text("old")
+
+    with AtomicFile(path, mode) as f:
+        f.write("+new" if mode == "a" else "new")
+        assert path.read_text() == "old"
+
+    assert path.read_text() == expected
+
+
+def test_append_creates_missing(tmp_path):
+    path = tmp_path / "map.log"
+    with AtomicFile(path, "a") as f:
+        f.write("new")
+    assert path.read_text() == "new"
@@ -0,0 +1,177 @@
+"""Test the base File positional I/O."""
+
+import errno
+import os
+
+import pytest
+
+from blkcache.file.base import HAVE_COPY_FILE_RANGE, File, is_zero
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Create a small file with known contents."""
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)))
+    return path
+
+
+def test_pread_reads_at_offset(path):
+    """pread returns the bytes at the requested offset."""
+    with File(path, "rb") as f:
+        assert f.pread(4, 16) == bytes([16, 17, 18, 19])
+
+
+def test_pread_does_not_move_position(path):
+    """pread leaves the file position where it was."""
+    with File(path, "rb") as f:
+        f.pread(8, 100)
+        assert f.tell() == 0
+
+
+def test_pwrite_is_visible_to_pread(path):
+    """Data written with pwrite can be read straight back."""
+    with File(path, "r+b") as f:
+        assert f.pwrite(b"blk", 10) == 3
+        assert f.pread(3, 10) == b"blk"
+
+
+def test_pread_past_end_is_empty(path):
+    """Reading beyond the end of the file returns no data."""
+    with File(path, "rb") as f:
+        assert f.pread(4, 1000) == b""
+
+
+def test_pread_requires_open_file(path):
+    """Positional I/O outside the context manager fails loudly."""
+    f = File(path, "rb")
+    with pytest.raises(IOError):
+        f.pread(1, 0)
+
+
+def test_file_methods_proxied(path):
+    """The stream methods go to the open file, and fail loudly outside the context."""
+    f = File(path, "r+b")
+    with pytest.raises(IOError):
+        f.tell()
+    with f:
+        assert f.seek(0, 2) == 256
+        assert f.write(b"end") == 3
+        f.flush()
+        assert f.seek(0) == 0
+        assert f.read(2) == bytes([0, 1])
+        assert f.truncate(4) == 4
+        with pytest.raises(AttributeError):
+            f.no_such_attribute
+    assert path.read_bytes() == bytes(range(4))
+
+
+def test_pread_straddling_end_returns_available(path):
+    """A read that runs off the end returns only the bytes that exist."""
+    with File(path, "rb") as f:
+        assert f.pread(10, 250) == bytes(range(250, 256))
+
+
+@pytest.mark.parametrize("offset,count", [(0, 4096), (10, 5), (4090, 20), (8190, 100), (9000, 10)])
+def test_pread_direct(tmp_path, offset, count):
+    """O_DIRECT reads (or their buffered fallback) return exactly the asked-for bytes."""
+    path = tmp_path / "direct.bin"
+    data = bytes(range(256)) * 32
+    path.write_bytes(data)
+
+    with File(path, "rb", direct=True) as f:
+        assert f.pread(count, offset) == data[offset : offset + count]
+
+
+@pytest.mark.parametrize("offset,count", [(0, 4096), (10, 5), (4090, 20), (8190, 2), (8000, 192)])
+def test_pwrite_direct(tmp_path, offset, count):
+    """O_DIRECT writes (or their buffered fallback) change exactly the given bytes and never grow the file."""
+    path = tmp_path / "direct.bin"
+    data = bytearray(range(256)) * 32
+    path.write_bytes(data)
+
+    with File(path, "r+b", direct=True) as f:
+        assert f.pwrite(b"x" * count, offset) == count
+
+    data[offset : offset + count] = b"x" * count
+    assert path.read_bytes() == data
+
+
+@pytest.mark.parametrize("data", [b"", bytes(4096)])
+def test_is_zero(data):
+    assert is_zero(data)
+
+
+@pytest.mark.parametrize("data", [b"\1" + bytes(10), bytes(10) + b"\1", bytes(5) + b"\1" + bytes(5)])
+def test_is_not_zero(data):
+    assert not is_zero(data)
+
+
+def test_is_hole(tmp_path):
+    """Unwritten stretches of a sparse file are holes, written ones aren't."""
+    path = tmp_path / "sparse"
+    with path.open("wb") as fh:
+        fh.truncate(1 << 20)
+    with File(path, "r+b") as f:
+        if not f.is_hole(0, 1 << 20):
+            pytest.skip("filesystem doesn't report holes")
+        f.pwrite(b"x", 0)
+        assert not f.is_hole(0, 4096)
+        assert f.is_hole(1 << 19, 1 << 19)
+        assert not f.is_hole(1 << 19, 1 << 20)  # runs past EOF, where nothing reads back
+
+
+def test_preadinto(path):
+    """Reads land in the caller's buffer, short at end of file."""
+    buf = bytearray(8)
+    with File(path, "rb") as f:
+        assert f.preadinto(memoryview(buf)[2:6], 10) == 4
+        assert buf == bytes(2) + bytes(range(10, 14)) + bytes(2)
+        assert f.preadinto(buf, 252) == 4
+        assert buf[:4] == bytes(range(252, 256))
+
+
+def test_copy_range(path, tmp_path):
+    """Bytes are copied to the same offset in the destination, stopping at end of file."""
+    dest = tmp_path / "dest.bin"
+    dest.write_bytes(bytes(256))
+    with File(path, "rb") as src, File(dest, "r+b") as dst:
+        copied = src.copy_range(dst, 250, 10)
+        if copied is None:
+            pytest.skip("copy_file_range not supported here")
+        assert copied == 6
+
+    assert dest.read_bytes() == bytes(250) + bytes(range(250, 256))
+
+
+def test_positional_io_after_close(path):
+    """Every positional call made after the context has closed fails with the not-open error."""
+    f = File(path, "r+b")
+    with f:
+        pass
+    with pytest.raises(IOError, match="not opened"):
+        f.pread(1, 0)
+    with pytest.raises(IOError, match="not opened"):
+        f.preadinto(bytearray(1), 0)
+    with pytest.raises(IOError, match="not opened"):
+        f.pwrite(b"x", 0)
+
+
+@pytest.mark.parametrize("error, refused", [(errno.EXDEV, True), (errno.EIO, False)])
+def test_copy_range_errors(path, tmp_path, monkeypatch, error, refused):
+    """Files the kernel can't copy between give None; read errors are raised like any other read's."""
+    if not HAVE_COPY_FILE_RANGE:
+        pytest.skip("no copy_file_range")
+
+    def copy_file_range(*args):
+        raise OSError(error, os.strerror(error))
+
+    monkeypatch.setattr(os, "copy_file_range", copy_file_range)
+    dest = tmp_path / "dest.bin"
+    dest.write_bytes(bytes(256))
+    with File(path, "rb") as src, File(dest, "r+b") as dst:
+        if refused:
+            assert src.copy_range(dst, 0, 10) is None
+        else:
+            with pytest.raises(OSError):
+                src.copy_range(dst, 0, 10)
@@ -0,0 +1,303 @@
+"""Test the read-through CachedFile."""
+
+import errno
+import os
+
+import pytest
+
+from blkcache import sidecar
+from blkcache.file.base import FADV_DONTNEED, FADV_RANDOM, FADV_SEQUENTIAL, File
+from blkcache.file.cached import CachedFile
+from blkcache.file.filemap import STATUS_ERROR, STATUS_OK, STATUS_UNTRIED
+
+
+@pytest.fixture
+def backing(tmp_path):
+    """A backing file with a zero-filled hole in the middle."""
+    path = tmp_path / "disc.iso"
+    path.write_bytes(b"A" * 1024 + bytes(1024) + b"B" * 1024)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """An empty, pre-sized cache file like the server creates."""
+    path = tmp_path / "disc.iso.cache~"
+    with path.open("wb") as fh:
+        fh.truncate(3072)
+    return path
+
+
+def test_read_through_fills_cache(backing, cache):
+    """Uncached reads come from the backing file and land in the cache."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        assert f.pread(8, 1020) == b"AAAA\0\0\0\0"
+        assert f.filemap[1020] == STATUS_OK
+        assert f.filemap[1028] == STATUS_UNTRIED
+
+    assert cache.read_bytes()[1020:1028] == b"AAAA\0\0\0\0"
+
+
+def test_cached_reads_skip_backing_file(backing, cache):
+    """Once cached, data is served from the cache file."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        f.pread(1024, 0)
+        backing.write_bytes(b"Z" * 3072)  # backing changes underneath us
+        assert f.pread(4, 0) == b"AAAA"
+
+
+def test_zero_blocks_are_cached(backing, cache):
+    """All-zero data is a cache hit, not mistaken for a hole."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        assert f.pread(1024, 1024) == bytes(1024)
+        assert f.filemap[1024] == STATUS_OK
+        assert f.filemap[2047] == STATUS_OK
+
+
+def test_read_spanning_cached_and_uncached_runs(backing, cache):
+    """A read over a mix of cached and uncached runs is stitched together in order."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        f.pread(16, 1016)
+        assert f.pread(3072, 0) == b"A" * 1024 + bytes(1024) + b"B" * 1024
+        assert f.filemap.transitions[0][2] == STATUS_OK
+        assert len(f.filemap.transitions) == 2
+
+
+def test_read_past_end_is_clamped(backing, cache):
+    """Reads are clamped to the backing file size."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        assert f.pread(100, 3070) == b"BB"
+        assert f.pread(10, 5000) == b""
+
+
+def test_sequential_misses_read_ahead(backing, cache):
+    """A miss that continues the previous one reads ahead into the cache."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=512) as f:
+        f.pread(256, 0)
+        assert f.filemap[256] == STATUS_UNTRIED
+
+        assert f.pread(256, 256) == b"A" * 256
+        assert f.filemap[1023] == STATUS_OK
+        assert f.filemap[1024] == STATUS_UNTRIED
+
+
+def test_read_ahead_stops_at_cached_data(backing, cache):
+    """Read-ahead never re-reads bytes that are already cached."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=2048) as f:
+        f.pread(16, 600)
+        f.pread(256, 0)
+        f.pread(256, 256)
+        assert f.filemap[599] == STATUS_OK
+        assert f.filemap[1000] == STATUS_UNTRIED
+
+
+def test_random_misses_do_not_read_ahead(backing, cache):
+    """Non-sequential misses only read what was asked for."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=512) as f:
+        f.pread(16, 2048)
+        f.pread(16, 0)
+        assert f.filemap[16] == STATUS_UNTRIED
+
+
+def test_mapfile_persists_filemap(backing, cache, tmp_path):
+    """The filemap is saved on exit and restored on the next open."""
+    mapfile = tmp_path / "disc.iso.log"
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        f.pread(100, 0)
+
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.filemap[0] == f.filemap[99] == STATUS_OK
+        assert f.filemap[100] == STATUS_UNTRIED
+
+
+def test_mapfile_only_written_when_dirty(backing, cache, tmp_path):
+    """Cache hits and no-op flushes never rewrite the mapfile."""
+    mapfile = tmp_path / "disc.iso.log"
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        f.flush()
+        assert not mapfile.exists()
+        f.pread(100, 0)
+        f.flush()
+        mapfile.write_text("sentinel")
+        f.pread(100, 0)
+
+    assert mapfile.read_text() == "sentinel"
+
+
+def test_sidecar_used_when_fresh(backing, cache, tmp_path):
+    """A fresh sidecar restores the map; a stale one is ignored for the mapfile."""
+    mapfile = tmp_path / "disc.iso.log"
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        f.pread(100, 0)
+    assert sidecar.path_for(mapfile).exists()
+
+    # Ranges in the text are ignored while the sidecar is newer
+    text = mapfile.read_text()
+    mapfile.write_text(text.replace("0x00000064  0x00000b9c  ?", "0x00000064  0x00000b9c  -"))
+    os.utime(mapfile, ns=(0, 0))
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.filemap[200] == STATUS_UNTRIED
+
+    # Once the text is newer it wins
+    mapfile.touch()
+    os.utime(sidecar.path_for(mapfile), ns=(0, 0))
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.filemap[200] == STATUS_ERROR
+
+
+def test_corrupt_sidecar_falls_back_to_mapfile(backing, cache, tmp_path):
+    """A fresh sidecar that fails validation is ignored in favour of the text mapfile."""
+    mapfile = tmp_path / "disc.iso.log"
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        f.pread(100, 0)
+
+    path = sidecar.path_for(mapfile)
+    data = path.read_bytes()
+    path.write_bytes(data[:-3] + b"xx" + data[-1:])
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.filemap[99] == STATUS_OK
+        assert f.filemap[100] == STATUS_UNTRIED
+
+
+def test_sector_size_from_mapfile_config(backing, cache, tmp_path, monkeypatch):
+    """A block size recorded in the mapfile is used without probing the device."""
+    mapfile = tmp_path / "disc.iso.log"
+    mapfile.write_text("## blkcache: block_size=2048\n")
+    monkeypatch.setattr(File, "_get_sector_size", lambda self: pytest.fail("probed"))
+
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.sector_size == 2048
+
+
+def test_sector_size_saved_to_mapfile(backing, cache, tmp_path, monkeypatch):
+    """The probed block size is written into the mapfile, then read back instead of probing."""
+    mapfile = tmp_path / "disc.iso.log"
+    monkeypatch.setattr(File, "_get_sector_size", lambda self: 4096)
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        f.pread(100, 0)
+    assert "## blkcache: block_size=4096\n" in mapfile.read_text()
+
+    monkeypatch.setattr(File, "_get_sector_size", lambda self: pytest.fail("probed"))
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), mapfile=mapfile) as f:
+        assert f.sector_size == 4096
+
+
+def test_failed_open_closes_files(backing, cache, tmp_path):
+    """A mapfile that won't load doesn't leave the backing and cache files open."""
+    mapfile = tmp_path / "disc.iso.log"
+    mapfile.write_text("## blkcache: bad\n")
+    backing_file, cache_file = File(backing, "rb"), File(cache, "r+b")
+
+    with pytest.raises(ValueError):
+        CachedFile(backing_file, cache_file, mapfile=mapfile).__enter__()
+    assert backing_file._fd is None
+    assert cache_file._fd is None
+
+
+def test_zero_fills_keep_cache_sparse(tmp_path):
+    """Zeros read into a hole of the cache aren't written, so it stays sparse."""
+    backing = tmp_path / "blank.iso"
+    backing.write_bytes(bytes(1 << 20))
+    cache = tmp_path / "blank.iso.cache~"
+    with cache.open("wb") as fh:
+        fh.truncate(1 << 20)
+
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        if not f.cache_file.is_hole(0, 1 << 20):
+            pytest.skip("filesystem doesn't report holes")
+        assert f.pread(1 << 20, 0) == bytes(1 << 20)
+        assert f.filemap[(1 << 20) - 1] == STATUS_OK
+        assert f.cache_file.is_hole(0, 1 << 20)
+
+
+def test_zero_fills_extend_short_cache(tmp_path):
+    """Zeros past the end of an unsized cache are still written, so they read back as cached."""
+    backing = tmp_path / "blank.iso"
+    backing.write_bytes(b"A" * 8192 + bytes(4096))
+    cache = tmp_path / "blank.iso.cache~"
+    cache.touch()
+
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        assert f.pread(4096, 8192) == bytes(4096)
+        assert f.pread(4096, 8192) == bytes(4096)
+
+
+def test_backing_hint_follows_access_pattern(backing, cache, monkeypatch):
+    """The backing file is hinted sequential or random only when the pattern changes."""
+    hints = []
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=0) as f:
+        monkeypatch.setattr(f.backing_file, "advise", lambda offset, length, advice: hints.append(advice))
+        f.pread(16, 2048)
+        f.pread(16, 0)
+        f.pread(16, 16)
+        f.pread(16, 32)
+
+    assert [hint for hint in hints if hint != FADV_DONTNEED] == [FADV_RANDOM, FADV_SEQUENTIAL]
+
+
+def test_size_measured_once(backing, cache, monkeypatch):
+    """The backing file's size is taken at open, not asked for again on every call."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        monkeypatch.setattr(f.backing_file, "size", lambda: pytest.fail("size probed again"))
+        assert f.size() == 3072
+        assert f.pread(10, 3070) == b"BB"
+
+
+def test_preadinto_fills_callers_buffer(backing, cache):
+    """Mixed cached and uncached runs land in the caller's buffer, short at the end."""
+    buf = bytearray(2060)
+    with CachedFile(File(backing, "rb"), File(cache, "r+b")) as f:
+        f.pread(8, 1020)
+        assert f.preadinto(memoryview(buf), 1012) == 2060
+        assert f.preadinto(memoryview(buf)[:100], 3000) == 72
+
+    assert buf[:72] == b"B" * 72
+    assert buf[2050:] == b"B" * 10
+
+
+def test_read_ahead_without_copy_file_range(backing, cache, monkeypatch):
+    """If the kernel can't copy between the files, read-ahead falls back to plain reads."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=512) as f:
+        monkeypatch.setattr(f.backing_file, "copy_range", lambda dest, offset, length: None)
+        f.pread(256, 0)
+        f.pread(256, 256)
+        assert f.filemap[1023] == STATUS_OK
+        assert f.filemap[1024] == STATUS_UNTRIED
+
+    assert cache.read_bytes()[:1024] == b"A" * 1024
+
+
+def test_bad_read_ahead_never_fails_the_read(backing, cache, monkeypatch):
+    """An unreadable sector in the read-ahead only cuts it short; the asked-for bytes still arrive."""
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=2048) as f:
+        real_pread = f.backing_file.pread
+
+        def pread(count, offset):
+            if offset <= 2048 < offset + count:
+                raise OSError(errno.EIO, "bad sector")
+            return real_pread(count, offset)
+
+        monkeypatch.setattr(f.backing_file, "pread", pread)
+        monkeypatch.setattr(f.backing_file, "copy_range", lambda dest, offset, length: None)
+        f.pread(256, 0)
+        assert f.pread(256, 256) == b"A" * 256
+        assert f.filemap[511] == STATUS_OK
+        assert f.filemap[512] == STATUS_UNTRIED
+
+
+def test_read_ahead_stops_at_known_bad_data(backing, cache, monkeypatch):
+    """Read-ahead doesn't run into runs already marked bad, so they aren't re-read speculatively."""
+    reads = []
+    with CachedFile(File(backing, "rb"), File(cache, "r+b"), readahead=2048) as f:
+        f.filemap[600:700] = STATUS_ERROR
+        real_pread = f.backing_file.pread
+        monkeypatch.setattr(
+            f.backing_file, "pread", lambda count, offset: reads.append(offset) or real_pread(count, offset)
+        )
+        monkeypatch.setattr(f.backing_file, "copy_range", lambda dest, offset, length: None)
+        f.pread(256, 0)
+        f.pread(256, 256)
+        assert f.filemap[599] == STATUS_OK
+        assert f.filemap[600] == STATUS_ERROR
+
+    assert reads == [0, 256, 512]
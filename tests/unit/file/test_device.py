@@ -0,0 +1,49 @@
+"""Test Device probing, using a regular file as a stand-in device."""
+
+import pytest
+
+from blkcache.file.device import DEFAULT_SECTOR_SIZE, Device
+from blkcache.file.removable import Removable
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "sr0.img"
+    path.write_bytes(bytes(4096))
+    return path
+
+
+@pytest.mark.parametrize("cls", [Device, Removable])
+def test_construct_and_probe(path, cls):
+    """Devices can be built and opened; probes fall back when ioctls don't apply."""
+    with cls(path, "rb") as dev:
+        assert dev.sector_size in (DEFAULT_SECTOR_SIZE, 2048)
+        assert dev.device_size() == 4096
+
+
+def test_probes_cached_per_open(path, monkeypatch):
+    """Each ioctl probe runs once per open, and again after reopening."""
+    calls = []
+    monkeypatch.setattr(Device, "_probe_size", lambda self: calls.append("size") or 4096)
+    monkeypatch.setattr(Device, "_get_sector_size", lambda self: calls.append("sector") or 512)
+
+    dev = Device(path, "rb")
+    for _ in range(2):
+        with dev:
+            for _ in range(3):
+                dev.device_size()
+                dev.sector_size
+
+    assert calls == ["size", "sector"] * 2
+
+
+def test_sector_size_needs_open_device(path):
+    """There is nothing to ioctl before the device is opened."""
+    with pytest.raises(IOError):
+        Device(path, "rb").sector_size
+
+
+def test_removable_probes_rotational_once(path, monkeypatch):
+    """Removable answers is_rotational itself instead of probing sysfs first."""
+    monkeypatch.setattr(Device, "_check_rotational", lambda self: pytest.fail("probed sysfs"))
+    assert Removable(path.with_name("sr0"), "rb").is_rotational
@@ -500,7 +500,7 @@ def test_status_property_corrupted_no_valid_statuses():
     """Test status property raises error when no valid statuses found."""
     filemap = FileMap(100)
     # Corrupt the transitions to have invalid status
-    filemap.transitions = [(0, NO_SORT, "INVALID"), (100, NO_SORT, "INVALID")]
+    filemap.transitions = [(0, NO_SORT, "X"), (100, NO_SORT, "X")]
 
     with pytest.raises(ValueError):
         filemap.status
@@ -604,3 +604,160 @@ def test_getitem_robust_with_end_marker():
     assert filemap[100] == STATUS_SLOW
     assert filemap[0:256] == [(0, NO_SORT, STATUS_SLOW), (255, NO_SORT, STATUS_SLOW)]
     assert filemap[255:256] == [(255, NO_SORT, STATUS_SLOW), (255, NO_SORT, STATUS_SLOW)]
+
+
+def test_run_at(filemap):
+    """Test run_at returns the run of equal status containing an offset."""
+    filemap[20:40] = STATUS_OK
+
+    assert filemap.run_at(0) == (0, 20, STATUS_UNTRIED)
+    assert filemap.run_at(20) == (20, 40, STATUS_OK)
+    assert filemap.run_at(39) == (20, 40, STATUS_OK)
+    assert filemap.run_at(99) == (40, 100, STATUS_UNTRIED)
+
+
+def test_set_ranges_sorted(filemap):
+    """Test set_ranges builds the same map as assigning each range in turn."""
+    ranges = [(0, 25, STATUS_OK), (25, 50, STATUS_OK), (60, 70, STATUS_ERROR)]
+    filemap.set_ranges(ranges)
+
+    expected = FileMap(100)
+    for start, stop, status in ranges:
+        expected[start:stop] = status
+
+    assert filemap.transitions == expected.transitions
+    assert filemap.transitions == [
+        (0, NO_SORT, STATUS_OK),
+        (50, NO_SORT, STATUS_UNTRIED),
+        (60, NO_SORT, STATUS_ERROR),
+        (70, NO_SORT, STATUS_UNTRIED),
+        (100, NO_SORT, STATUS_UNTRIED),
+    ]
+
+
+def test_set_ranges_overlapping_applied_in_order(filemap):
+    """Test set_ranges falls back to ordered assignment for overlapping ranges."""
+    filemap.set_ranges([(10, 60, STATUS_OK), (40, 50, STATUS_ERROR), (0, 20, STATUS_SLOW)])
+
+    assert filemap[0:100] == [
+        (0, NO_SORT, STATUS_SLOW),
+        (20, NO_SORT, STATUS_OK),
+        (40, NO_SORT, STATUS_ERROR),
+        (50, NO_SORT, STATUS_OK),
+        (60, NO_SORT, STATUS_UNTRIED),
+        (99, NO_SORT, STATUS_UNTRIED),
+    ]
+
+
+def test_set_ranges_bounds_checked(filemap):
+    """Test set_ranges rejects ranges beyond the device size."""
+    with pytest.raises(ValueError):
+        filemap.set_ranges([(0, 10, STATUS_OK), (90, 101, STATUS_OK)])
+
+
+def test_runs():
+    """runs() yields each run with its end, not the end marker."""
+    fm = FileMap(100)
+    fm[10:20] = STATUS_OK
+    assert list(fm.runs()) == [(0, 10, STATUS_UNTRIED), (10, 20, STATUS_OK), (20, 100, STATUS_UNTRIED)]
+
+
+def test_transitions_setter_compacts():
+    """Redundant and empty transitions are folded away, the end marker stays."""
+    fm = FileMap(100)
+    fm.transitions = [
+        (0, NO_SORT, STATUS_OK),
+        (10, NO_SORT, STATUS_OK),
+        (20, NO_SORT, STATUS_ERROR),
+        (20, NO_SORT, STATUS_OK),
+        (50, NO_SORT, STATUS_OK),
+        (100, NO_SORT, STATUS_OK),
+    ]
+    assert fm.transitions == [(0, NO_SORT, STATUS_OK), (100, NO_SORT, STATUS_OK)]
+
+
+def test_set_ranges_sorted_prefix_then_overlap(filemap):
+    """Only the ranges after the first out-of-order one are applied individually."""
+    ranges = [(0, 10, STATUS_OK), (20, 30, STATUS_ERROR), (25, 40, STATUS_SLOW), (90, 100, STATUS_OK)]
+    filemap.set_ranges(ranges)
+
+    expected = FileMap(100)
+    for start, stop, status in ranges:
+        expected[start:stop] = status
+
+    assert filemap.transitions == expected.transitions
+
+
+def test_set_ranges_unsorted_disjoint(filemap):
+    """Unsorted ranges that don't overlap build the same map as assigning each in turn."""
+    ranges = [(60, 70, STATUS_ERROR), (0, 25, STATUS_OK), (5, 5, STATUS_SLOW), (25, 50, STATUS_OK)]
+    filemap.set_ranges(ranges)
+
+    expected = FileMap(100)
+    for start, stop, status in ranges:
+        expected[start:stop] = status
+
+    assert filemap.arrays == expected.arrays == ([0, 50, 60, 70, 100], b"+?-??")
+
+
+def test_set_same_status_leaves_map_alone(filemap):
+    """Re-marking a range with the status it already has changes nothing."""
+    filemap[10:50] = STATUS_OK
+    before = filemap.arrays
+    filemap[20:30] = STATUS_OK
+    filemap[10:50] = STATUS_OK
+    filemap[60:100] = STATUS_UNTRIED
+    assert filemap.arrays == before
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        [(0, 40, STATUS_OK), (40, 60, STATUS_ERROR), (60, 100, STATUS_UNTRIED)],  # whole map, as ddrescue writes
+        [(10, 40, STATUS_OK), (40, 60, STATUS_ERROR)],  # untried either side
+        [(0, 10, STATUS_UNTRIED), (10, 20, STATUS_OK), (20, 30, STATUS_OK), (30, 50, STATUS_UNTRIED)],  # repeats
+        [(0, 10, STATUS_OK), (20, 30, STATUS_ERROR)],  # gap
+        [(0, 10, STATUS_OK), (10, 10, STATUS_ERROR), (10, 30, STATUS_SLOW)],  # empty range
+        [(10, 60, STATUS_OK), (40, 50, STATUS_ERROR)],  # overlap
+        [],
+    ],
+)
+def test_set_columns_matches_set_ranges(filemap, ranges):
+    """Column input builds the same map as the equivalent ranges, on or off the fast path."""
+    filemap.set_columns([r[0] for r in ranges], [r[1] for r in ranges], "".join(r[2] for r in ranges))
+
+    expected = FileMap(100)
+    expected.set_ranges(ranges)
+    assert filemap.arrays == expected.arrays
+
+
+def test_set_columns_on_a_used_map(filemap):
+    """Columns are applied over what's already there, not in place of it."""
+    filemap[80:90] = STATUS_ERROR
+    filemap.set_columns([0, 40], [40, 60], STATUS_OK + STATUS_SLOW)
+
+    assert filemap[85] == STATUS_ERROR
+    assert filemap[50] == STATUS_SLOW
+
+
+def test_pos_and_status_follow_every_change(filemap):
+    """The cached pos and status are dropped by each kind of update."""
+    assert (filemap.pos, filemap.status) == (0, STATUS_UNTRIED)
+
+    filemap[0:10] = STATUS_OK
+    assert (filemap.pos, filemap.status) == (10, STATUS_UNTRIED)
+
+    filemap[10:100] = STATUS_OK
+    assert (filemap.pos, filemap.status) == (100, STATUS_OK)
+
+    filemap.transitions = [(0, NO_SORT, STATUS_ERROR), (100, NO_SORT, STATUS_UNTRIED)]
+    assert (filemap.pos, filemap.status) == (100, STATUS_ERROR)
+
+    filemap.arrays = ([0, 50, 100], b"+??")
+    assert (filemap.pos, filemap.status) == (50, STATUS_UNTRIED)
+
+    blank = FileMap(100)
+    blank.set_columns([0, 30], [30, 100], STATUS_OK + STATUS_SLOW)
+    assert (blank.pos, blank.status) == (100, STATUS_SLOW)
+    blank.set_ranges([(0, 10, STATUS_ERROR)])
+    assert blank.status == STATUS_ERROR
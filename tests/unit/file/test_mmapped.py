@@ -0,0 +1,75 @@
+"""Test the memory-mapped File."""
+
+import pytest
+
+from blkcache.file.base import FADV_DONTNEED, FADV_SEQUENTIAL, FADV_WILLNEED, File
+from blkcache.file.cached import CachedFile
+from blkcache.file.mmapped import MMappedFile
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"0123456789" * 1000)
+    return path
+
+
+def test_pread_pwrite(path):
+    """Reads and writes go through the mapping."""
+    with MMappedFile(path, "r+b") as f:
+        assert f.pread(4, 10) == b"0123"
+        assert f.pwrite(b"abcd", 10) == 4
+        assert f.pread(6, 8) == b"89abcd"
+        assert f.pread(10, 9995) == b"56789"
+
+        buf = bytearray(10)
+        assert f.preadinto(buf, 9995) == 5
+        assert buf[:5] == b"56789"
+
+    assert path.read_bytes()[10:14] == b"abcd"
+
+
+def test_prefault(path):
+    """Prefaulting is only a hint; reads are unchanged."""
+    with MMappedFile(path, "rb", prefault=True) as f:
+        assert f.pread(10, 9990) == b"0123456789"
+
+
+def test_closed_after_exit(path):
+    """The mapping goes away with the context."""
+    f = MMappedFile(path, "rb")
+    with f:
+        pass
+    with pytest.raises(IOError):
+        f.pread(1, 0)
+
+
+@pytest.mark.parametrize("advice", [FADV_SEQUENTIAL, FADV_WILLNEED, FADV_DONTNEED, None])
+def test_advise_keeps_data(path, advice):
+    """Hints on unaligned and out of range spans never fail or lose data."""
+    with MMappedFile(path, "r+b") as f:
+        f.pwrite(b"xyz", 5000)
+        f.advise(4999, 10, advice)
+        f.advise(9000, 5000, advice)
+        f.advise(20000, 10, advice)
+        assert f.pread(3, 5000) == b"xyz"
+
+
+def test_as_cache_file(path, tmp_path):
+    """CachedFile can serve hits straight from a mapped cache."""
+    cache = tmp_path / "cache~"
+    with cache.open("wb") as fh:
+        fh.truncate(10000)
+
+    with CachedFile(File(path, "rb"), MMappedFile(cache, "r+b")) as f:
+        assert f.pread(10, 100) == b"0123456789"
+        assert f.pread(10, 100) == b"0123456789"
+
+    assert cache.read_bytes()[100:110] == b"0123456789"
+
+
+def test_fingerprint_matches_file(path):
+    """Hashing from the mapping gives the same fingerprint as reading the file."""
+    with File(path, "rb") as f, MMappedFile(path, "rb") as m:
+        assert m.fingerprint() == f.fingerprint()
+        assert m.fingerprint(100) == f.fingerprint(100)
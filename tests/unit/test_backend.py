@@ -0,0 +1,162 @@
+"""Tests for the nbdkit backend handle table."""
+
+import pytest
+
+from blkcache import backend
+
+
+@pytest.fixture
+def dev(tmp_path, monkeypatch):
+    path = tmp_path / "dev.img"
+    path.write_bytes(b"x" * 1024)
+    monkeypatch.setattr(backend, "DEV", path)
+    yield path
+    for h in list(backend.TABLE):
+        backend.close(h)
+    backend.FREE.clear()
+
+
+def test_handles_are_unique(dev):
+    """Closing a handle doesn't let a new open clobber a live one."""
+    a = backend.open(True)
+    b = backend.open(True)
+    backend.close(a)
+    c = backend.open(True)
+    d = backend.open(True)
+
+    assert len({b, c, d}) == 3
+    assert set(backend.TABLE) == {b, c, d}
+
+
+def test_closed_handles_are_reused(dev):
+    """Released IDs are handed out again rather than growing forever."""
+    a = backend.open(True)
+    backend.close(a)
+    assert backend.open(True) == a
+
+
+def test_pread_and_size(dev):
+    """Reads go through to the opened file."""
+    h = backend.open(True)
+    assert backend.get_size(h) == 1024
+    buf = bytearray(4)
+    backend.pread(h, buf, 0, 0)
+    assert buf == b"xxxx"
+
+
+def test_short_pread_fails(dev):
+    """A read past the end is an error, not a partly filled buffer."""
+    h = backend.open(True)
+    with pytest.raises(IOError):
+        backend.pread(h, bytearray(8), 1020, 0)
+
+
+def test_capabilities_probed_once(dev):
+    """Capabilities are answered from the table without touching the file."""
+    h = backend.open(True)
+    obj, backend.TABLE[h] = backend.TABLE[h], None
+
+    assert backend.can_write(h) is False
+    assert backend.can_extents(h) is False
+    backend.TABLE[h] = obj
+
+
+def test_probe_calls_methods():
+    """Both callables and plain attributes count as capability answers."""
+
+    class Caps:
+        can_flush = True
+
+        def can_write(self):
+            return True
+
+    caps = backend.probe(Caps())
+    assert caps["can_write"] and caps["can_flush"]
+    assert not caps["can_trim"]
+
+
+def test_config_metadata(monkeypatch, caplog):
+    """Metadata pairs are parsed and malformed ones reported, not silently lost."""
+    monkeypatch.setattr(backend, "METADATA", {})
+    backend.config("metadata", "a=1, b = x=y ,junk,")
+
+    assert backend.METADATA == {"a": "1", "b": "x=y"}
+    assert "junk" in caplog.text
+
+
+def test_config_cache_pollute(dev, tmp_path, monkeypatch):
+    """cache_pollute= is a flag for the cache, not metadata."""
+    cache = tmp_path / "dev.img.cache~"
+    cache.touch()
+    monkeypatch.setattr(backend, "CACHE", cache)
+    monkeypatch.setattr(backend, "CACHE_POLLUTE", False)
+    monkeypatch.setattr(backend, "METADATA", {})
+    backend.config("cache_pollute", "true")
+
+    assert backend.METADATA == {}
+    assert backend.TABLE[backend.open(True)].cache_pollute
+
+
+def test_reads_through_cache(dev, tmp_path, monkeypatch):
+    """With a cache configured, reads fill it and are recorded in the mapfile."""
+    cache = tmp_path / "dev.img.cache~"
+    with cache.open("wb") as fh:
+        fh.truncate(1024)
+    mapfile = tmp_path / "dev.img.log"
+    monkeypatch.setattr(backend, "CACHE", cache)
+    monkeypatch.setattr(backend, "MAPFILE", mapfile)
+
+    h = backend.open(True)
+    buf = bytearray(8)
+    backend.pread(h, memoryview(buf), 100, 0)
+    assert buf == b"x" * 8
+    backend.close(h)
+
+    assert cache.read_bytes()[100:108] == b"x" * 8
+    assert "0x00000064  0x00000008  +" in mapfile.read_text()
+
+
+def test_handles_share_the_cache(dev, tmp_path, monkeypatch):
+    """Handles share one cache, so the mapfile keeps fills from every handle, not just the last closed."""
+    cache = tmp_path / "dev.img.cache~"
+    with cache.open("wb") as fh:
+        fh.truncate(1024)
+    mapfile = tmp_path / "dev.img.log"
+    monkeypatch.setattr(backend, "CACHE", cache)
+    monkeypatch.setattr(backend, "MAPFILE", mapfile)
+
+    a = backend.open(True)
+    b = backend.open(True)
+    assert backend.TABLE[a] is backend.TABLE[b]
+    backend.pread(a, bytearray(8), 0, 0)
+    backend.pread(b, bytearray(8), 512, 0)
+    backend.close(b)
+    assert not mapfile.exists()  # a still has it open
+    backend.close(a)
+
+    text = mapfile.read_text()
+    assert "0x00000000  0x00000008  +" in text
+    assert "0x00000200  0x00000008  +" in text
+    assert backend.SHARED is None
+
+
+def test_refused_open_keeps_handles_unique(dev, tmp_path, monkeypatch):
+    """A refused open doesn't use up a free ID, so the next open can't reuse a live handle."""
+    cache = tmp_path / "dev.img.cache~"
+    with cache.open("wb") as fh:
+        fh.truncate(1024)
+    monkeypatch.setattr(backend, "CACHE", cache)
+    monkeypatch.setattr(backend, "MAPFILE", tmp_path / "dev.img.log")
+
+    a = backend.open(True)
+    b = backend.open(True)
+    backend.close(a)
+    with pytest.raises(IOError):
+        backend.open(False)  # The shared cache is read-only
+
+    c = backend.open(True)
+    assert c != b
+    assert set(backend.TABLE) == {b, c}
+    backend.close(b)
+    backend.close(c)
+    assert backend.SHARED is None
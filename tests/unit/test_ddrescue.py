@@ -3,7 +3,7 @@
 import pytest
 from io import StringIO
 
-from blkcache.ddrescue import iter_filemap_ranges, parse_status, load, save
+from blkcache.ddrescue import iter_filemap_ranges, parse_status, load, load_header, save
 from blkcache.file.filemap import (
     FileMap,
     STATUS_OK,
@@ -367,6 +367,16 @@ def test_save_empty_filemap():
     assert "0x00000000  0x00000400  ?" in data_lines[0]  # 1024 bytes = 0x400
 
 
+def test_save_zero_size_filemap():
+    """A zero-size map has no ranges to write, not one empty one."""
+    filemap = FileMap(0)
+    file = StringIO()
+    save(file, [], filemap, {})
+
+    assert list(iter_filemap_ranges(filemap)) == []
+    assert file.getvalue().endswith("#  pos  size  status\n")
+
+
 def test_save_with_all_statuses():
     """Test saving filemap with all possible status types."""
     filemap = FileMap(6144)  # 6KB to fit all statuses
@@ -593,3 +603,112 @@ def test_roundtrip_complex_transitions():
     transitions1 = list(iter_filemap_ranges(filemap1))
     transitions2 = list(iter_filemap_ranges(filemap2))
     assert transitions1 == transitions2
+
+
+def test_iter_filemap_ranges_merges_same_status():
+    """Redundant transitions never produce adjacent ranges with the same status."""
+    filemap = FileMap(100)
+    filemap.transitions = [
+        (0, None, STATUS_OK),
+        (10, None, STATUS_OK),
+        (20, None, STATUS_ERROR),
+        (20, None, STATUS_OK),
+        (50, None, STATUS_UNTRIED),
+        (100, None, STATUS_UNTRIED),
+    ]
+
+    assert list(iter_filemap_ranges(filemap)) == [(0, 50, STATUS_OK), (50, 50, STATUS_UNTRIED)]
+
+
+def test_load_header_stops_before_ranges():
+    """load_header reads comments, config and pass without touching the data lines."""
+    content = """# Rescue Logfile
+## blkcache: block_size=2048
+# current_pos  current_status  current_pass
+0x00000000     ?               3
+#      pos        size  status
+not a range at all
+"""
+    comments, config = [], {}
+
+    assert load_header(StringIO(content), comments, config) == 3
+    assert comments == ["# Rescue Logfile"]
+    assert config == {"block_size": "2048"}
+
+
+def test_load_old_two_column_header():
+    """Older ddrescue's current_pos line has no pass; it's skipped, not read as a range."""
+    filemap = FileMap(64)
+    load(StringIO("# current_pos  current_status\n0x00000000     ?\n0x00  0x10  +\n"), [], filemap, {})
+    assert filemap.pass_ == FileMap(64).pass_
+    assert list(iter_filemap_ranges(filemap)) == [(0, 16, "+"), (16, 48, "?")]
+
+
+def test_load_header_without_pos_line():
+    """Files with no current_pos line have no pass number."""
+    assert load_header(StringIO("0x0  0x10  +\n"), [], {}) is None
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "# current_pos  current_status  current_pass",
+        "# current_pos  current_status",
+        "#      pos        size  status",
+    ],
+)
+def test_load_drops_regenerated_headers(header):
+    """Headers save() writes itself, including older ddrescue's, aren't kept as comments."""
+    comments = []
+    load(StringIO(f"# keep me\n{header}\n"), comments, FileMap(100), {})
+    assert comments == ["# keep me"]
+
+
+def test_load_config_strips_whitespace():
+    """Config keys and values lose their surrounding spaces; values may contain '='."""
+    config = {}
+    load(StringIO("## blkcache:  key = a=b\n"), [], FileMap(100), config)
+    assert config == {"key": "a=b"}
+
+
+def test_load_scraped_status_is_not_a_comment():
+    """A '#' in the status column is data, even on the whole-buffer path."""
+    file = StringIO("0x0  ?  1\n#  pos  size  status\n0x00  0x10  #\n  0x10  0x10  +\n")
+    comments = []
+    filemap = FileMap(64)
+
+    load(file, comments, filemap, {})
+
+    assert comments == []
+    assert list(iter_filemap_ranges(filemap)) == [
+        (0, 16, STATUS_SCRAPED),
+        (16, 16, STATUS_OK),
+        (32, 32, STATUS_UNTRIED),
+    ]
+
+
+@pytest.mark.parametrize(
+    "data, error",
+    [
+        ("0x00  0x10  +\n0x10  0x10\n", IndexError),
+        ("0x00  0x10  X\n", ValueError),
+        ("0x00  0x10  ++\n", ValueError),
+        ("0x00  0x10  \u00ab\n", ValueError),
+        ("0xzz  0x10  +\n", ValueError),
+        ("0x00  0xzz  +\n", ValueError),
+        ("0x00  0x10  +  0x05\n0x20  +\n", ValueError),
+        ("0x00\n0x10  +\n", IndexError),
+    ],
+)
+def test_load_bad_data_still_raises(data, error):
+    """Anything the column parser can't take falls back to the line parser and its errors."""
+    with pytest.raises(error):
+        load(StringIO(f"0x0  ?  1\n{data}"), [], FileMap(64), {})
+
+
+@pytest.mark.parametrize("data", ["0x00  0x10  +\n\n0x10  0x10  -\n", "0x00  0x10  +  \r\n0x10  0x10  -"])
+def test_load_loose_layout_still_parses(data):
+    """Blank lines, trailing blanks, CRs and a missing final newline take the line parser, with the same result."""
+    filemap = FileMap(64)
+    load(StringIO(f"0x0  ?  1\n{data}"), [], filemap, {})
+    assert list(iter_filemap_ranges(filemap)) == [(0, 16, "+"), (16, 16, "-"), (32, 32, "?")]
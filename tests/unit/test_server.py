@@ -0,0 +1,71 @@
+"""Tests for the server's cache and mapfile helpers."""
+
+import logging
+import os
+
+from blkcache import server, sidecar
+
+log = logging.getLogger(__name__)
+
+
+def test_create_cache_new(tmp_path):
+    """A new cache is sized to the device and reported as new."""
+    cache = tmp_path / "disc.iso.cache.abc~"
+    assert server._create_cache(cache, 4096, False, log)
+    assert cache.stat().st_size == 4096
+
+
+def test_create_cache_resumes(tmp_path):
+    """An existing cache is left as it is and reported as not new."""
+    cache = tmp_path / "disc.iso.cache.abc~"
+    cache.write_bytes(b"x" * 100)
+    assert not server._create_cache(cache, 4096, False, log)
+    assert cache.read_bytes() == b"x" * 100
+
+
+def test_create_cache_preallocate_failure(tmp_path, monkeypatch, caplog):
+    """If preallocating fails the cache is still created, sparse, with a warning."""
+
+    def fail(fd, offset, length):
+        raise OSError("not supported")
+
+    monkeypatch.setattr(os, "posix_fallocate", fail)
+    cache = tmp_path / "disc.iso.cache.abc~"
+    assert server._create_cache(cache, 4096, True, log)
+    assert cache.stat().st_size == 4096
+    assert "Couldn't preallocate" in caplog.text
+
+
+def test_mapfile_sits_next_to_cache(tmp_path):
+    """The mapfile is named from the ISO and disc like the cache is."""
+    iso = tmp_path / "disc.iso"
+    assert server._mapfile_name(iso, "abc").parent == server._cache_name(iso, "abc").parent
+    assert server._mapfile_name(iso, "abc") != server._mapfile_name(iso, "def")
+
+
+def test_remove_mapfile(tmp_path):
+    """A stale mapfile and its sidecar both go; missing ones are fine."""
+    mapfile = server._mapfile_name(tmp_path / "disc.iso", "abc")
+    mapfile.write_text("stale")
+    sidecar.path_for(mapfile).write_bytes(b"stale")
+
+    server._remove_mapfile(mapfile)
+    assert not mapfile.exists()
+    assert not sidecar.path_for(mapfile).exists()
+    server._remove_mapfile(mapfile)
+
+
+def test_new_cache_drops_stale_mapfile(tmp_path):
+    """A mapfile left without its cache is removed when a new cache is made, but kept on resume."""
+    iso = tmp_path / "disc.iso"
+    cache, mapfile = server._cache_name(iso, "abc"), server._mapfile_name(iso, "abc")
+    mapfile.write_text("stale")
+    sidecar.path_for(mapfile).write_bytes(b"stale")
+
+    server._start_cache(cache, mapfile, 4096, False, log)
+    assert not mapfile.exists()
+    assert not sidecar.path_for(mapfile).exists()
+
+    mapfile.write_text("current")
+    server._start_cache(cache, mapfile, 4096, False, log)
+    assert mapfile.read_text() == "current"
@@ -0,0 +1,70 @@
+"""Test the binary FileMap sidecar."""
+
+from io import BytesIO
+
+import pytest
+
+from blkcache import sidecar
+from blkcache.file.filemap import STATUS_ERROR, STATUS_OK, FileMap
+
+
+@pytest.fixture
+def filemap():
+    filemap = FileMap(1 << 40)
+    filemap[0:4096] = STATUS_OK
+    filemap[1 << 32 : (1 << 32) + 512] = STATUS_ERROR
+    filemap.pass_ = 2
+    return filemap
+
+
+def test_round_trip(filemap):
+    """A saved map loads back identically."""
+    buf = BytesIO()
+    sidecar.save(buf, filemap)
+    buf.seek(0)
+
+    loaded = FileMap(filemap.size)
+    assert sidecar.load(buf, loaded)
+    assert loaded.transitions == filemap.transitions
+    assert loaded.pass_ == 2
+
+
+@pytest.mark.parametrize("mangle", [lambda b: b[:-1], lambda b: b"NOTAMAP!" + b[8:], lambda b: b""])
+def test_rejects_bad_data(filemap, mangle):
+    """Truncated or foreign data is refused and leaves the map alone."""
+    buf = BytesIO()
+    sidecar.save(buf, filemap)
+
+    loaded = FileMap(filemap.size)
+    assert not sidecar.load(BytesIO(mangle(buf.getvalue())), loaded)
+    assert loaded.transitions == FileMap(filemap.size).transitions
+
+
+def _corrupt_status(data: bytes) -> bytes:
+    return data[:-2] + b"x" + data[-1:]
+
+
+def _corrupt_position(data: bytes) -> bytes:
+    # Second transition (4096) pushed past the third
+    at = len(sidecar.MAGIC) + sidecar.HEADER.size + 8
+    return data[:at] + (1 << 48).to_bytes(8, "little") + data[at + 8 :]
+
+
+@pytest.mark.parametrize("mangle", [_corrupt_status, _corrupt_position])
+def test_rejects_corrupt_columns(filemap, mangle):
+    """Bad statuses or out of order positions are refused even when the length fits."""
+    buf = BytesIO()
+    sidecar.save(buf, filemap)
+
+    loaded = FileMap(filemap.size)
+    assert not sidecar.load(BytesIO(mangle(buf.getvalue())), loaded)
+    assert loaded.transitions == FileMap(filemap.size).transitions
+
+
+def test_rejects_other_size(filemap):
+    """A sidecar for a different sized device doesn't apply."""
+    buf = BytesIO()
+    sidecar.save(buf, filemap)
+    buf.seek(0)
+
+    assert not sidecar.load(buf, FileMap(filemap.size - 1))